@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи операций: построчная вставка с commit на каждую запись
+(как в POST /operations/) против executemany и COPY одной транзакцией
+(как в POST /operations/bulk)
+
+Запуск:
+    python benchmarks/bench_bulk_insert.py --rows 20000 --single-rows 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+from sqlalchemy import delete, insert
+
+from src.database import async_session_maker
+from src.operations.bulk import bulk_transaction, write_operations
+from src.operations.models import Operation
+
+BENCH_TYPE = "bench_bulk_insert"
+
+
+def make_rows(count):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "quantity": Decimal(index % 100 + 1),
+            "figi": f"BBG{index % 500:09d}",
+            "instrument_type": "bond",
+            "date": start + timedelta(seconds=index),
+            "type": BENCH_TYPE,
+        }
+        for index in range(count)
+    ]
+
+
+async def bench_single_row(rows):
+    async with async_session_maker() as session:
+        for row in rows:
+            await session.execute(insert(Operation).values(**row))
+            await session.commit()
+
+
+async def bench_executemany(rows, chunk_size):
+    async with async_session_maker() as session:
+        for start in range(0, len(rows), chunk_size):
+            await session.execute(insert(Operation), rows[start:start + chunk_size])
+        await session.commit()
+
+
+async def bench_copy(rows, chunk_size):
+    async with async_session_maker() as session:
+        async with bulk_transaction(session) as driver_connection:
+            for start in range(0, len(rows), chunk_size):
+                await write_operations(session, driver_connection, rows[start:start + chunk_size])
+        await session.commit()
+
+
+async def cleanup():
+    async with async_session_maker() as session:
+        await session.execute(delete(Operation).where(Operation.type == BENCH_TYPE))
+        await session.commit()
+
+
+async def measure(name, coro, count):
+    started = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - started
+    await cleanup()
+    print(f"  {name:<14} {count:>9} строк  {elapsed:8.3f} с  {count / elapsed:12.0f} строк/с")
+    return count / elapsed
+
+
+async def main(args):
+    await cleanup()
+    print("Бенчмарк записи операций")
+    print("=" * 60)
+    single = await measure("single-row", bench_single_row(make_rows(args.single_rows)), args.single_rows)
+    await measure("executemany", bench_executemany(make_rows(args.rows), args.chunk_size), args.rows)
+    copy = await measure("copy", bench_copy(make_rows(args.rows), args.chunk_size), args.rows)
+    print("=" * 60)
+    print(f"COPY быстрее построчной вставки в {copy / single:.1f} раз")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="строк для executemany и COPY")
+    parser.add_argument("--single-rows", type=int, default=2000, help="строк для построчной вставки")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="размер пачки")
+    asyncio.run(main(parser.parse_args()))
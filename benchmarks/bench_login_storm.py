@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный бенчмарк: задержка GET /operations/ во время потока логинов.
+Сначала измеряется задержка чтения без фоновой нагрузки, затем - пока параллельно
+выполняются запросы POST /auth/login. Если хэширование паролей блокирует цикл событий,
+p99 чтения во втором прогоне резко растет.
+
+Приложение должно быть уже запущено:
+    python run_app.py
+    python benchmarks/bench_login_storm.py --url http://127.0.0.1:8000 --duration 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+import httpx
+
+from src.config import DEFAULT_ADMIN_PASSWORD
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def read_loop(client, operation_type, deadline, latencies):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/operations/", params={"operation_type": operation_type, "limit": 10})
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+
+
+async def login_loop(client, email, password, deadline, counter):
+    while time.perf_counter() < deadline:
+        await client.post("/auth/login", data={"username": email, "password": password})
+        counter[0] += 1
+
+
+async def run(args, with_storm):
+    deadline = time.perf_counter() + args.duration
+    latencies = []
+    logins = [0]
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        tasks = [read_loop(client, args.operation_type, deadline, latencies) for _ in range(args.readers)]
+        if with_storm:
+            tasks += [
+                login_loop(client, args.email, args.password, deadline, logins)
+                for _ in range(args.login_concurrency)
+            ]
+        await asyncio.gather(*tasks)
+    return latencies, logins[0]
+
+
+def report(name, latencies, logins, duration):
+    print(
+        f"  {name:<16} запросов: {len(latencies):>6}  "
+        f"p50: {statistics.median(latencies):7.1f} мс  "
+        f"p95: {percentile(latencies, 95):7.1f} мс  "
+        f"p99: {percentile(latencies, 99):7.1f} мс  "
+        f"логинов/с: {logins / duration:6.1f}"
+    )
+
+
+async def main(args):
+    print(f"Задержка GET /operations/ ({args.readers} читателей, {args.duration} с на прогон)")
+    print("=" * 100)
+    latencies, logins = await run(args, with_storm=False)
+    report("без логинов", latencies, logins, args.duration)
+    latencies, logins = await run(args, with_storm=True)
+    report(f"{args.login_concurrency} логинов", latencies, logins, args.duration)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--operation-type", default="buy")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default=DEFAULT_ADMIN_PASSWORD)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Накладные расходы метрик: стоимость одного наблюдения гистограммы и прохода
+запроса через MetricsMiddleware по сравнению с приложением без него
+
+Запуск:
+    python benchmarks/bench_metrics.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+from src.monitoring.metrics import Histogram, MetricsMiddleware
+
+
+class _Route:
+    path = "/operations/"
+
+
+async def plain_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def run_requests(app, count: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app({"type": "http", "path": "/operations/", "method": "GET"}, receive, send)
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "Гистограмма для замера", ("route",))
+    started = time.perf_counter()
+    for i in range(args.requests):
+        histogram.observe((i % 1000) / 10000, "/operations/")
+    observe_time = (time.perf_counter() - started) / args.requests
+
+    plain_time = asyncio.run(run_requests(plain_app, args.requests))
+    metered_time = asyncio.run(run_requests(MetricsMiddleware(plain_app), args.requests))
+
+    print(f"Наблюдение гистограммы:     {observe_time * 1e6:8.2f} мкс")
+    print(f"Запрос без middleware:      {plain_time * 1e6:8.2f} мкс")
+    print(f"Запрос с MetricsMiddleware: {metered_time * 1e6:8.2f} мкс "
+          f"(+{(metered_time - plain_time) * 1e6:.2f} мкс)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Сравнение MessagePack и JSON на пачках операций в формате OperationCreate:
+размер тела и время кодирования/декодирования на одну пачку
+
+Сравниваются стандартный json, orjson (если установлен) и msgpack (если установлен).
+
+Запуск:
+    python benchmarks/bench_msgpack.py --batch-sizes 1,100,1000 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+from src.serialization import msgpack, orjson
+
+INSTRUMENTS = [(f"BBG00{i:07d}", "share" if i % 4 else "bond") for i in range(200)]
+
+
+def make_batch(size: int, rng: random.Random):
+    # Так выглядит тело POST /operations/bulk от торгового робота:
+    # quantity строкой (Decimal без потери точности), дата в ISO 8601
+    start = datetime(2024, 1, 1)
+    batch = []
+    for _ in range(size):
+        figi, instrument_type = rng.choice(INSTRUMENTS)
+        batch.append({
+            "quantity": str(rng.randint(1, 100000) / 100),
+            "figi": figi,
+            "instrument_type": instrument_type,
+            "date": (start + timedelta(seconds=rng.randint(0, 86400 * 365))).isoformat(),
+            "type": rng.choice(("buy", "sell")),
+        })
+    return batch
+
+
+def codecs():
+    yield "json", lambda value: json.dumps(value).encode(), json.loads
+    if orjson is not None:
+        yield "orjson", orjson.dumps, orjson.loads
+    if msgpack is not None:
+        yield "msgpack", msgpack.packb, lambda data: msgpack.unpackb(data, raw=False)
+
+
+def measure(func, argument, repeat: int) -> float:
+    func(argument)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(argument)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,100,1000")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if msgpack is None:
+        print("msgpack не установлен, сравниваются только JSON-кодировщики (pip install msgpack)")
+
+    rng = random.Random(42)
+    for size in (int(value) for value in args.batch_sizes.split(",")):
+        batch = make_batch(size, rng)
+        print(f"\nПачка из {size} операций")
+        print(f"{'формат':10} {'размер, байт':>14} {'кодирование, мкс':>18} {'декодирование, мкс':>20}")
+        for name, encode, decode in codecs():
+            data = encode(batch)
+            assert decode(data) == batch
+            encode_time = measure(encode, batch, args.repeat)
+            decode_time = measure(decode, data, args.repeat)
+            print(f"{name:10} {len(data):14} {encode_time * 1e6:18.1f} {decode_time * 1e6:20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк сериализации ответа GET /operations/: процессорное время на 10 тыс. строк
+
+Сравниваются прежние пути (строки с Decimal через jsonable_encoder или через
+response_model и pydantic) и новый: простые dict со строковым quantity через
+src.serialization.dumps (orjson, если установлен, иначе стандартный json).
+
+Запуск:
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+from fastapi.encoders import jsonable_encoder
+
+from src.operations.schemas import OperationPage
+from src.serialization import dumps, orjson
+
+
+def make_rows(count: int, quantity_as_text: bool):
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        quantity = Decimal(i % 1000) / 10
+        rows.append({
+            "id": i,
+            "quantity": str(quantity) if quantity_as_text else quantity,
+            "figi": f"BBG{i % 500:09d}",
+            "instrument_type": "share",
+            "date": start + timedelta(seconds=i),
+            "type": "buy",
+        })
+    return rows
+
+
+def encode_jsonable(rows):
+    return json.dumps(jsonable_encoder({"items": rows, "next_cursor": None})).encode()
+
+
+def encode_response_model(rows):
+    # Так FastAPI сериализует ответ с response_model=OperationPage
+    return json.dumps(OperationPage(items=rows, next_cursor=None).model_dump(mode="json")).encode()
+
+
+def encode_fast(rows):
+    return dumps({"items": rows, "next_cursor": None})
+
+
+def measure(encode, rows, repeat: int):
+    encode(rows)
+    started = time.process_time()
+    for _ in range(repeat):
+        encode(rows)
+    return (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    decimal_rows = make_rows(args.rows, quantity_as_text=False)
+    text_rows = make_rows(args.rows, quantity_as_text=True)
+    per_10k = 10000 / args.rows
+
+    print(f"Строк в ответе: {args.rows}, повторов: {args.repeat}, orjson: {'да' if orjson else 'нет'}")
+    baseline = None
+    for name, encode, rows in (
+        ("jsonable_encoder + json", encode_jsonable, decimal_rows),
+        ("response_model (pydantic)", encode_response_model, decimal_rows),
+        ("простые столбцы + dumps", encode_fast, text_rows),
+    ):
+        seconds = measure(encode, rows, args.repeat) * per_10k
+        baseline = baseline or seconds
+        print(f"{name:28} {seconds * 1000:8.1f} мс CPU на 10 тыс. строк  (x{baseline / seconds:.1f})")
+
+
+if __name__ == "__main__":
+    main()
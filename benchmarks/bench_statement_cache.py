@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк накладных расходов на построение, компиляцию и подготовку запроса
+GET /operations/ в расчете на один HTTP-запрос
+
+Без --db измеряется только работа на стороне Python (построение выражения и компиляция
+SQLAlchemy), с --db дополнительно сравнивается выполнение с кэшем подготовленных выражений
+asyncpg и без него (как в режиме DB_PGBOUNCER_MODE).
+
+Запуск:
+    python benchmarks/bench_statement_cache.py --iterations 20000
+    python benchmarks/bench_statement_cache.py --db --iterations 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+import asyncpg
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.operations.models import Operation
+from src.operations.queries import OPERATION_COLUMNS, build_operations_query
+
+AFTER_DATE = datetime(2024, 1, 1)
+
+
+def build_per_request():
+    # Так запрос строился до введения заранее построенных запросов
+    return (
+        select(*OPERATION_COLUMNS)
+        .where(Operation.type == "buy")
+        .where(tuple_(Operation.date, Operation.id) > (AFTER_DATE, 10))
+        .order_by(Operation.date, Operation.id)
+        .limit(101)
+    )
+
+
+def measure(name, func, iterations):
+    func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call = (time.perf_counter() - started) / iterations * 1e6
+    print(f"  {name:<44} {per_call:9.1f} мкс/запрос")
+    return per_call
+
+
+def bench_python(iterations):
+    dialect = asyncpg_dialect()
+    cached_statement, _ = build_operations_query("buy", None, limit=101)
+
+    print("Построение и компиляция на стороне Python")
+    print("=" * 70)
+    full = measure(
+        "построение + компиляция (промах кэша)",
+        lambda: build_per_request().compile(dialect=dialect),
+        iterations,
+    )
+    per_request = measure(
+        "построение + ключ кэша (попадание в кэш)",
+        lambda: build_per_request()._generate_cache_key(),
+        iterations,
+    )
+    prebuilt = measure(
+        "готовый запрос + ключ кэша",
+        lambda: cached_statement._generate_cache_key(),
+        iterations,
+    )
+    print("=" * 70)
+    print(f"  Экономия относительно построения на каждый запрос: {per_request - prebuilt:.1f} мкс")
+    print(f"  Экономия относительно полной компиляции: {full - prebuilt:.1f} мкс")
+
+
+async def bench_database(iterations):
+    statement, params = build_operations_query("buy", None, limit=101)
+    compiled = statement.compile(dialect=asyncpg_dialect())
+    sql = str(compiled)
+    args = [params[name] for name in compiled.positiontup]
+    dsn = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    print()
+    print("Выполнение в базе данных")
+    print("=" * 70)
+    results = {}
+    for name, cache_size in (("с кэшем подготовленных выражений", 100), ("без кэша (PgBouncer)", 0)):
+        conn = await asyncpg.connect(dsn, statement_cache_size=cache_size)
+        try:
+            await conn.fetch(sql, *args)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await conn.fetch(sql, *args)
+            results[name] = (time.perf_counter() - started) / iterations * 1e6
+        finally:
+            await conn.close()
+        print(f"  {name:<44} {results[name]:9.1f} мкс/запрос")
+    print("=" * 70)
+    saved = results["без кэша (PgBouncer)"] - results["с кэшем подготовленных выражений"]
+    print(f"  Стоимость подготовки выражения: {saved:.1f} мкс/запрос")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--db", action="store_true", help="также измерить подготовку выражений в базе")
+    args = parser.parse_args()
+    bench_python(args.iterations)
+    if args.db:
+        asyncio.run(bench_database(args.iterations))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Сравнение двух файлов результатов load_suite.py (например, до и после коммита).
+Регрессией считается падение пропускной способности или рост p95/p99 больше чем
+на --threshold процентов, а также рост числа SQL-выражений на запрос.
+С --fail-on-regression код выхода 1 при найденной регрессии (для CI).
+
+Запуск:
+    python benchmarks/compare_results.py base.json new.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare_scenario(name, old, new, threshold):
+    """
+    Печатает сравнение сценария и возвращает список найденных регрессий
+    """
+    regressions = []
+    if not old.get("requests") or not new.get("requests"):
+        print(f"  {name}: нет данных в одном из прогонов")
+        return regressions
+
+    # (название, старое, новое, рост - это ухудшение)
+    metrics = [
+        ("зап/с", old["throughput_rps"], new["throughput_rps"], False),
+        ("p50, мс", old["latency_ms"]["p50"], new["latency_ms"]["p50"], True),
+        ("p95, мс", old["latency_ms"]["p95"], new["latency_ms"]["p95"], True),
+        ("p99, мс", old["latency_ms"]["p99"], new["latency_ms"]["p99"], True),
+        ("SQL/запрос", old.get("statements_per_request"), new.get("statements_per_request"), True),
+    ]
+    print(f"  {name}")
+    for label, old_value, new_value, higher_is_worse in metrics:
+        delta = change(old_value, new_value)
+        mark = ""
+        if delta is not None:
+            worse = delta > 0 if higher_is_worse else delta < 0
+            # Число выражений детерминировано, поэтому для него порог не применяется
+            limit = 0 if label == "SQL/запрос" else threshold
+            if worse and abs(delta) > limit and label != "p50, мс":
+                mark = "  <- регрессия"
+                regressions.append(f"{name}: {label} {old_value} -> {new_value}")
+        delta_text = f"{delta:+7.1f}%" if delta is not None else "       -"
+        print(f"    {label:<12} {str(old_value):>10} -> {str(new_value):>10}  {delta_text}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10, help="допустимое ухудшение, %%")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    print(f"Базовый прогон: {base.get('commit')} ({base.get('timestamp')})")
+    print(f"Новый прогон:   {new.get('commit')} ({new.get('timestamp')})")
+    if base.get("settings") != new.get("settings"):
+        print(f"Внимание: настройки прогонов различаются:\n  {base.get('settings')}\n  {new.get('settings')}")
+    print("=" * 70)
+
+    regressions = []
+    for name in base["scenarios"]:
+        if name in new["scenarios"]:
+            regressions += compare_scenario(name, base["scenarios"][name], new["scenarios"][name], args.threshold)
+
+    print("=" * 70)
+    if regressions:
+        print(f"Найдено регрессий: {len(regressions)}")
+        for regression in regressions:
+            print(f"  {regression}")
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print("Регрессий не найдено")
+
+
+if __name__ == "__main__":
+    main()
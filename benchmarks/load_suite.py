@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Воспроизводимый нагрузочный прогон API. Скрипт запускает src.main:app через uvicorn
+(или использует уже запущенное приложение, --url), доводит число синтетических операций
+в базе до --operations и нагружает сценарии с постоянной параллельностью:
+
+    post_operation - POST /operations/
+    get_operations - GET /operations/?operation_type=...
+    login          - POST /auth/login
+
+Для каждого сценария выводятся пропускная способность, p50/p95/p99 задержки и среднее
+число SQL-выражений на запрос (заголовок X-Query-Count, сервер запускается с
+SQL_TRACE_ENABLED=true). Выражения фоновых задач в это число не входят: при
+OPERATIONS_GROUP_COMMIT=true запись POST /operations/ выполняет фоновый писатель, и
+SQL/запрос для post_operation занижен. Результаты сохраняются в JSON для сравнения между коммитами:
+
+    python benchmarks/load_suite.py --operations 1000000 --concurrency 32 --duration 30
+    python benchmarks/compare_results.py benchmarks/results/old.json benchmarks/results/new.json
+
+Нужны httpx и доступный Postgres из настроек .env
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Добавляем корень проекта и src в путь поиска модулей
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+import httpx
+
+from src.config import DEFAULT_ADMIN_PASSWORD, OPERATIONS_GROUP_COMMIT
+
+SCENARIOS = ("post_operation", "get_operations", "login")
+RESULTS_DIR = os.path.join(project_dir, "benchmarks", "results")
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_dir, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(args):
+    # X-Query-Count нужен для подсчета SQL-выражений на запрос
+    env = dict(os.environ, SQL_TRACE_ENABLED="true")
+    command = [
+        sys.executable, "-m", "uvicorn", "src.main:app",
+        "--host", args.host, "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=project_dir, env=env)
+
+
+async def wait_until_ready(url, server, timeout):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+        while time.perf_counter() < deadline:
+            if server is not None and server.poll() is not None:
+                raise RuntimeError(f"Приложение завершилось с кодом {server.returncode}")
+            try:
+                if (await client.get("/health/pool")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Приложение не ответило за {timeout} с")
+
+
+async def ensure_operations(target, random_seed):
+    """
+    Доводит число операций в базе до target, чтобы повторные прогоны шли на одном объеме данных
+    """
+    from src.database import engine
+    from src.seeding import SyntheticOperations, count_rows, default_fixtures, seed
+
+    try:
+        existing = (await count_rows())["operations"]
+        if existing < target:
+            print(f"Генерация {target - existing} операций (в базе {existing})...")
+            started = time.perf_counter()
+            await seed(default_fixtures(SyntheticOperations(count=target - existing, random_seed=random_seed)))
+            print(f"  готово за {time.perf_counter() - started:.1f} с")
+        else:
+            print(f"В базе {existing} операций, генерация не нужна")
+        return max(existing, target)
+    finally:
+        await engine.dispose()
+
+
+def make_scenarios(args):
+    start = datetime(2024, 1, 1)
+
+    async def post_operation(client, rng):
+        return await client.post("/operations/", json={
+            "quantity": str(rng.randint(1, 100000) / 100),
+            "figi": f"BBG{rng.randint(0, 499):09d}",
+            "instrument_type": rng.choice(("share", "bond", "etf")),
+            "date": (start + timedelta(seconds=rng.randint(0, 86400 * 365))).isoformat(),
+            "type": rng.choice(("buy", "sell")),
+        })
+
+    async def get_operations(client, rng):
+        return await client.get("/operations/", params={"operation_type": args.operation_type, "limit": args.page_size})
+
+    async def login(client, rng):
+        return await client.post("/auth/login", data={"username": args.email, "password": args.password})
+
+    return {"post_operation": post_operation, "get_operations": get_operations, "login": login}
+
+
+async def run_scenario(url, request, args):
+    latencies = []
+    statements = []
+    errors = 0
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.duration
+
+    async def worker(client, worker_id):
+        nonlocal errors
+        rng = random.Random(args.random_seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await request(client, rng)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                response, failed = None, True
+            finished = time.perf_counter()
+            if started < measure_from:
+                continue
+            latencies.append((finished - started) * 1000)
+            if failed:
+                errors += 1
+            elif response.headers.get("x-query-count") is not None:
+                statements.append(int(response.headers["x-query-count"]))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        await asyncio.gather(*(worker(client, i) for i in range(args.concurrency)))
+
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / args.duration, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2),
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+        },
+        "statements_per_request": round(statistics.mean(statements), 2) if statements else None,
+    }
+
+
+def report(name, result):
+    if not result["requests"]:
+        print(f"  {name:<16} нет завершенных запросов")
+        return
+    latency = result["latency_ms"]
+    statements = result["statements_per_request"]
+    print(
+        f"  {name:<16} {result['throughput_rps']:>8.1f} зап/с  "
+        f"p50: {latency['p50']:7.1f} мс  p95: {latency['p95']:7.1f} мс  p99: {latency['p99']:7.1f} мс  "
+        f"SQL/запрос: {statements if statements is not None else '-':>5}  ошибок: {result['errors']}"
+    )
+
+
+async def main(args):
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://{args.host}:{args.port}"
+        server = start_server(args)
+    try:
+        await wait_until_ready(url, server, args.startup_timeout)
+        operations = await ensure_operations(args.operations, args.random_seed) if args.operations else None
+
+        requests = make_scenarios(args)
+        print(f"\nПараллельность {args.concurrency}, прогрев {args.warmup} с, замер {args.duration} с на сценарий")
+        print("=" * 110)
+        results = {}
+        for name in scenarios:
+            results[name] = await run_scenario(url, requests[name], args)
+            report(name, results[name])
+        if "post_operation" in results and (server is None or OPERATIONS_GROUP_COMMIT):
+            print(
+                "  SQL/запрос не учитывает фоновые задачи: при OPERATIONS_GROUP_COMMIT=true запись "
+                "post_operation выполняет фоновый писатель"
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    commit = git_commit()
+    document = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "workers": args.workers if server is not None else None,
+            "operations": operations,
+            "page_size": args.page_size,
+            # При групповой записи SQL/запрос для post_operation не включает саму запись
+            "group_commit": OPERATIONS_GROUP_COMMIT if server is not None else None,
+        },
+        "scenarios": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="адрес уже запущенного приложения (без запуска uvicorn)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--operations", type=int, default=100000, help="сколько операций должно быть в базе (0 - не генерировать)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15, help="секунд замера на сценарий")
+    parser.add_argument("--warmup", type=float, default=3, help="секунд прогрева перед замером")
+    parser.add_argument("--operation-type", default="buy")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default=DEFAULT_ADMIN_PASSWORD)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="файл результатов (по умолчанию benchmarks/results/)")
+    asyncio.run(main(parser.parse_args()))
@@ -37,7 +37,7 @@ def main():
         ("python-dotenv", "dotenv"),
         ("fastapi", None),
         ("fastapi-users[sqlalchemy]", "fastapi_users"),
-        ("uvicorn", None),
+        ("uvicorn>=0.54", "uvicorn"),
     ]
     
     success_count = 0
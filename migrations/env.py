@@ -12,6 +12,10 @@ sys.path.append(os.path.join(sys.path[0], 'src'))
 
 from src.config import DB_HOST, DB_PORT, DB_USER, DB_NAME, DB_PASS
 from src.database import Base
+# Импортируем модели, чтобы они были зарегистрированы в Base.metadata
+from src.auth import models as auth_models
+from src.operations import models as operations_models
+from src.operations.partitions import is_partition_table
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -35,6 +39,18 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Партиции operation создаются обслуживающей задачей и не описаны в моделях,
+    # autogenerate не должен предлагать их удалить
+    if type_ == "table" and reflected and is_partition_table(name):
+        return False
+    # Служебная таблица с отпечатком схемы ведется auto_create_tables
+    if type_ == "table" and name == "app_schema_state":
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -59,6 +75,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -80,7 +97,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
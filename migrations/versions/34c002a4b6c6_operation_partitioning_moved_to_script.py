@@ -0,0 +1,27 @@
+"""Operation partitioning moved to partition_operation.py
+
+Ревизия оставлена, чтобы не разрывать цепочку: раньше она секционировала operation
+в зависимости от OPERATION_PARTITIONING. Теперь секционирование выполняется явной
+командой python partition_operation.py (обратно - --revert), а ревизия схему не меняет.
+Перед откатом на ревизии ниже этой верните обычную таблицу командой с --revert.
+
+Revision ID: 34c002a4b6c6
+Revises: b872036e0b4b
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+
+# revision identifiers, used by Alembic.
+revision = '34c002a4b6c6'
+down_revision = 'b872036e0b4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,25 @@
+"""User token version
+
+Revision ID: 3e9a7b5c2d81
+Revises: 8c4b2f1d6a37
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e9a7b5c2d81'
+down_revision = '8c4b2f1d6a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Версия токенов: токены с устаревшей версией после смены роли или пароля не принимаются
+    op.add_column('user', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'token_version')
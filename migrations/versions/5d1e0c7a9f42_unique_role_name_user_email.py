@@ -0,0 +1,46 @@
+"""Unique role name and user email
+
+Revision ID: 5d1e0c7a9f42
+Revises: 34c002a4b6c6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e0c7a9f42'
+down_revision = '34c002a4b6c6'
+branch_labels = None
+depends_on = None
+
+# Начальные данные вставляются через ON CONFLICT по этим столбцам
+UNIQUE_CONSTRAINTS = (
+    ("role_name_key", "role", "name"),
+    ("user_email_key", "user", "email"),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for constraint_name, table, column in UNIQUE_CONSTRAINTS:
+        existing = inspector.get_unique_constraints(table)
+        if any(constraint["column_names"] == [column] for constraint in existing):
+            continue
+        duplicates = bind.execute(
+            sa.text(f'SELECT count(*) FROM (SELECT {column} FROM "{table}" GROUP BY {column} HAVING count(*) > 1) d')
+        ).scalar()
+        if duplicates:
+            raise RuntimeError(
+                f"В таблице {table} {duplicates} повторяющихся значений {column}. "
+                f"Удалите дубликаты перед миграцией: "
+                f'SELECT {column}, count(*) FROM "{table}" GROUP BY {column} HAVING count(*) > 1'
+            )
+        op.create_unique_constraint(constraint_name, table, [column])
+
+
+def downgrade() -> None:
+    for constraint_name, table, _ in UNIQUE_CONSTRAINTS:
+        op.drop_constraint(constraint_name, table, type_="unique")
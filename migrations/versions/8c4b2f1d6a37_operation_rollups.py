@@ -0,0 +1,89 @@
+"""Operation rollup tables
+
+Revision ID: 8c4b2f1d6a37
+Revises: 5d1e0c7a9f42
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4b2f1d6a37'
+down_revision = '5d1e0c7a9f42'
+branch_labels = None
+depends_on = None
+
+# Копия запросов пересчета на момент ревизии: код приложения может меняться дальше
+REFRESH_DAILY_FIGI_SQL = """
+INSERT INTO operation_daily_figi
+    (figi, day, operations, volume, min_quantity, max_quantity, position, position_operations)
+SELECT figi, date_trunc('day', date), count(*), coalesce(sum(quantity), 0), min(quantity), max(quantity),
+       coalesce(sum(CASE WHEN type = ANY(:sell_types) THEN -quantity
+                         WHEN type = ANY(:buy_types) THEN quantity END), 0),
+       count(*) FILTER (WHERE type = ANY(:sell_types) OR type = ANY(:buy_types))
+FROM operation
+WHERE figi IS NOT NULL AND date IS NOT NULL
+GROUP BY 1, 2
+"""
+
+REFRESH_HOURLY_TYPE_SQL = """
+INSERT INTO operation_hourly_type (type, hour, operations, volume, min_quantity, max_quantity)
+SELECT type, date_trunc('hour', date), count(*), coalesce(sum(quantity), 0), min(quantity), max(quantity)
+FROM operation
+WHERE type IS NOT NULL AND date IS NOT NULL
+GROUP BY 1, 2
+"""
+
+
+def _operation_types(name: str, default: str):
+    # Типы покупок и продаж - настройка окружения (OPERATIONS_BUY_TYPES / OPERATIONS_SELL_TYPES)
+    return [t.strip() for t in os.environ.get(name, default).split(",") if t.strip()]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "operation_daily_figi",
+        sa.Column("figi", sa.String(), nullable=False),
+        sa.Column("day", sa.TIMESTAMP(), nullable=False),
+        sa.Column("operations", sa.BigInteger(), nullable=False),
+        sa.Column("volume", sa.Numeric(), nullable=False),
+        sa.Column("min_quantity", sa.Numeric(), nullable=True),
+        sa.Column("max_quantity", sa.Numeric(), nullable=True),
+        sa.Column("position", sa.Numeric(), nullable=False),
+        sa.Column("position_operations", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("figi", "day"),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "operation_hourly_type",
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("hour", sa.TIMESTAMP(), nullable=False),
+        sa.Column("operations", sa.BigInteger(), nullable=False),
+        sa.Column("volume", sa.Numeric(), nullable=False),
+        sa.Column("min_quantity", sa.Numeric(), nullable=True),
+        sa.Column("max_quantity", sa.Numeric(), nullable=True),
+        sa.PrimaryKeyConstraint("type", "hour"),
+        if_not_exists=True,
+    )
+
+    # Заполняем сводки по уже накопленным операциям
+    bind = op.get_bind()
+    bind.execute(sa.text("DELETE FROM operation_daily_figi"))
+    bind.execute(sa.text("DELETE FROM operation_hourly_type"))
+    bind.execute(
+        sa.text(REFRESH_DAILY_FIGI_SQL),
+        {
+            "buy_types": _operation_types("OPERATIONS_BUY_TYPES", "buy"),
+            "sell_types": _operation_types("OPERATIONS_SELL_TYPES", "sell"),
+        },
+    )
+    bind.execute(sa.text(REFRESH_HOURLY_TYPE_SQL))
+
+
+def downgrade() -> None:
+    op.drop_table("operation_hourly_type")
+    op.drop_table("operation_daily_figi")
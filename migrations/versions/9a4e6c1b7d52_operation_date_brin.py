@@ -0,0 +1,24 @@
+"""Operation date BRIN index
+
+Revision ID: 9a4e6c1b7d52
+Revises: 3e9a7b5c2d81
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e6c1b7d52'
+down_revision = '3e9a7b5c2d81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Пересчет сводок за последние часы читает operation по диапазону date
+    op.create_index("ix_operation_date_brin", "operation", ["date"], postgresql_using="brin", if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_operation_date_brin", table_name="operation", if_exists=True)
@@ -0,0 +1,65 @@
+"""Initial tables
+
+Revision ID: aa7dca948490
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aa7dca948490'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Таблицы могли быть уже созданы через create_all при запуске приложения,
+    # поэтому базовая ревизия создает только недостающие
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("role"):
+        op.create_table(
+            "role",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("permissions", sa.JSON(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    if not inspector.has_table("user"):
+        op.create_table(
+            "user",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("registered_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("role_id", sa.Integer(), nullable=True),
+            sa.Column("hashed_password", sa.String(length=1024), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("is_superuser", sa.Boolean(), nullable=False),
+            sa.Column("is_verified", sa.Boolean(), nullable=False),
+            sa.ForeignKeyConstraint(["role_id"], ["role.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    if not inspector.has_table("operation"):
+        op.create_table(
+            "operation",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("quantity", sa.String(), nullable=True),
+            sa.Column("figi", sa.String(), nullable=True),
+            sa.Column("instrument_type", sa.String(), nullable=True),
+            sa.Column("date", sa.TIMESTAMP(), nullable=True),
+            sa.Column("type", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("operation")
+    op.drop_table("user")
+    op.drop_table("role")
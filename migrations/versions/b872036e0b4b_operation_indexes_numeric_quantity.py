@@ -0,0 +1,62 @@
+"""Operation indexes and numeric quantity
+
+Revision ID: b872036e0b4b
+Revises: aa7dca948490
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b872036e0b4b'
+down_revision = 'aa7dca948490'
+branch_labels = None
+depends_on = None
+
+# Значение считается числом, если после обрезки пробелов подходит под формат numeric
+NUMERIC_PATTERN = r"^[-+]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][-+]?[0-9]+)?$"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Таблица могла быть создана через create_all уже с числовым quantity
+    columns = {column["name"]: column for column in sa.inspect(bind).get_columns("operation")}
+    if not isinstance(columns["quantity"]["type"], sa.Numeric):
+        invalid = bind.execute(
+            sa.text(
+                "SELECT count(*) FROM operation "
+                "WHERE nullif(trim(quantity), '') IS NOT NULL AND trim(quantity) !~ :pattern"
+            ),
+            {"pattern": NUMERIC_PATTERN},
+        ).scalar()
+        if invalid:
+            raise RuntimeError(
+                f"В таблице operation {invalid} строк с нечисловым quantity. "
+                f"Исправьте их перед миграцией: SELECT id, quantity FROM operation "
+                f"WHERE trim(quantity) !~ '{NUMERIC_PATTERN}'"
+            )
+        # Пустые строки становятся NULL, остальные значения приводятся к numeric
+        op.alter_column(
+            "operation",
+            "quantity",
+            type_=sa.Numeric(),
+            existing_type=sa.String(),
+            postgresql_using="nullif(trim(quantity), '')::numeric",
+        )
+
+    op.create_index("ix_operation_type_date", "operation", ["type", "date", "id"], if_not_exists=True)
+    op.create_index("ix_operation_figi_date", "operation", ["figi", "date"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_operation_figi_date", table_name="operation")
+    op.drop_index("ix_operation_type_date", table_name="operation")
+    op.alter_column(
+        "operation",
+        "quantity",
+        type_=sa.String(),
+        existing_type=sa.Numeric(),
+        postgresql_using="quantity::text",
+    )
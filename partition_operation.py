@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Перевод существующей таблицы operation в секционированную по date (помесячно) с переносом данных.
+Выполняется один раз, вместе с включением OPERATION_PARTITIONING=true; дальше партиции
+обслуживает приложение. С --revert таблица переводится обратно в обычную.
+
+    python partition_operation.py
+    python partition_operation.py --revert
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Добавляем src в путь поиска модулей
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.config import OPERATION_PARTITIONING
+from src.database import engine
+from src.operations.partitions import convert_to_partitioned, convert_to_plain
+
+
+async def partition_operation(revert=False):
+    try:
+        async with engine.begin() as conn:
+            if revert:
+                print("Перевод operation в обычную таблицу...")
+                changed = await conn.run_sync(convert_to_plain)
+            else:
+                print("Перевод operation в секционированную таблицу...")
+                changed = await conn.run_sync(convert_to_partitioned)
+        await engine.dispose()
+
+        if not changed:
+            print("✓ Таблица уже в нужном виде, изменений нет")
+        else:
+            print("✓ Готово")
+        if not revert and not OPERATION_PARTITIONING:
+            print("Включите OPERATION_PARTITIONING=true, чтобы приложение создавало новые партиции")
+        return True
+
+    except Exception as e:
+        print(f"✗ Ошибка при переводе таблицы operation: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revert", action="store_true", help="вернуть обычную таблицу")
+    args = parser.parse_args()
+
+    if not asyncio.run(partition_operation(args.revert)):
+        sys.exit(1)
@@ -1,31 +1,164 @@
 #!/usr/bin/env python3
 """
-Скрипт для запуска FastAPI приложения
+Скрипт для запуска FastAPI приложения.
+
+Без аргументов - режим разработки: один процесс на 127.0.0.1:8000 с перезагрузкой кода.
+С --prod - режим production:
+    - воркеры по числу ядер (APP_WORKERS / --workers);
+    - uvloop и httptools, если установлены;
+    - сокет с SO_REUSEPORT: новый экземпляр можно запустить на том же порту,
+      пока старый дорабатывает начатые запросы;
+    - при остановке начатые запросы дорабатываются до APP_GRACEFUL_TIMEOUT секунд;
+    - воркер перезапускается после APP_MAX_REQUESTS запросов, если задано;
+    - пулы соединений воркеров делят общий лимит DB_CONNECTION_BUDGET.
+
+    python run_app.py --prod --workers 8 --db-connection-budget 100
 """
 
-import uvicorn
-import sys
+import argparse
+import importlib.util
 import os
+import socket
+import sys
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+# Добавляем текущую директорию в путь поиска модулей
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from src.config import (
+    APP_GRACEFUL_TIMEOUT,
+    APP_HOST,
+    APP_MAX_REQUESTS,
+    APP_MAX_REQUESTS_JITTER,
+    APP_PORT,
+    APP_WORKERS,
+    AUTH_USER_CACHE_BACKEND,
+    AUTH_USER_CACHE_ENABLED,
+    DB_CONNECTION_BUDGET,
+)
+
+
+def run_dev():
+    # Запуск приложения с правильными параметрами
+    uvicorn.run(
+        "src.main:app",
+        host="127.0.0.1",
+        port=8000,
+        reload=True,
+        log_level="info"
+    )
+
+
+def worker_pool_settings(budget: int, workers: int):
+    """
+    Делит общий лимит соединений с Postgres между воркерами. Одно соединение
+    каждого воркера оставлено под LISTEN/NOTIFY, остальные - пул и его переполнение
+    """
+    per_worker = budget // workers
+    if per_worker < 2:
+        raise ValueError(
+            f"Лимита в {budget} соединений не хватает на {workers} воркеров: нужно хотя бы 2 на воркер"
+        )
+    pool_connections = per_worker - 1
+    pool_size = max(1, pool_connections - pool_connections // 4)
+    return pool_size, pool_connections - pool_size
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family=family)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_workers(config: uvicorn.Config, sockets):
+    # Супервизор uvicorn >= 0.54 сам поднимает завершившиеся воркеры, в том числе после limit_max_requests
+    Multiprocess(config, sockets=sockets).run()
+
+
+def run_prod(args):
+    workers = args.workers or os.cpu_count() or 1
+    if args.db_connection_budget:
+        pool_size, max_overflow = worker_pool_settings(args.db_connection_budget, workers)
+        # Воркеры запускаются новыми процессами и читают настройки пула из окружения
+        os.environ["DB_POOL_SIZE"] = str(pool_size)
+        os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+        print(
+            f"Соединений с Postgres: до {args.db_connection_budget} на {workers} воркеров "
+            f"(пул {pool_size} + переполнение {max_overflow} + 1 для уведомлений на воркер)"
+        )
+
+    max_requests = args.max_requests
+    if max_requests:
+        print(
+            f"Воркеры перезапускаются после {max_requests} запросов: подписчики ленты теряют соединение, "
+            "а кэши в памяти воркера сбрасываются"
+        )
+
+    if workers > 1 and AUTH_USER_CACHE_ENABLED and AUTH_USER_CACHE_BACKEND == "local":
+        print(
+            "Внимание: кэш пользователей с AUTH_USER_CACHE_BACKEND=local при нескольких воркерах "
+            "принимает отозванные токены до AUTH_USER_CACHE_TTL секунд, задайте postgres"
+        )
+
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    print(f"Воркеров: {workers}, цикл событий: {loop}, HTTP-парсер: {http}")
+
+    config = uvicorn.Config(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        limit_max_requests=max_requests or None,
+        limit_max_requests_jitter=args.max_requests_jitter if max_requests else 0,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        backlog=args.backlog,
+        proxy_headers=True,
+        access_log=args.access_log,
+        log_level="info",
+    )
+    sock = bind_socket(args.host, args.port)
+    # Единственный воркер тоже запускается под супервизором, если он перезапускается по числу
+    # запросов: сам по себе uvicorn после limit_max_requests просто завершается
+    if workers > 1 or max_requests:
+        run_workers(config, [sock])
+    else:
+        uvicorn.Server(config).run(sockets=[sock])
+
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prod", action="store_true", help="режим production")
+    parser.add_argument("--host", default=APP_HOST)
+    parser.add_argument("--port", type=int, default=APP_PORT)
+    parser.add_argument("--workers", type=int, default=APP_WORKERS, help="0 - по числу ядер")
+    parser.add_argument("--max-requests", type=int, default=APP_MAX_REQUESTS, help="0 - без перезапуска воркеров")
+    parser.add_argument("--max-requests-jitter", type=int, default=APP_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=APP_GRACEFUL_TIMEOUT)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--db-connection-budget", type=int, default=DB_CONNECTION_BUDGET)
+    parser.add_argument("--access-log", action="store_true", help="журнал каждого запроса")
+    args = parser.parse_args()
+
     try:
         print("Запуск FastAPI приложения Trading App...")
         print("=====================================")
-        
-        # Добавляем текущую директорию в путь поиска модулей
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        if current_dir not in sys.path:
-            sys.path.insert(0, current_dir)
-        
-        # Запуск приложения с правильными параметрами
-        uvicorn.run(
-            "src.main:app",
-            host="127.0.0.1",
-            port=8000,
-            reload=True,
-            log_level="info"
-        )
-        
+        if args.prod:
+            run_prod(args)
+        else:
+            run_dev()
+
     except Exception as e:
         print(f"Ошибка при запуске приложения: {e}")
         import traceback
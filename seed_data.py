@@ -1,132 +1,43 @@
 #!/usr/bin/env python3
 """
-Скрипт для заполнения базы данных начальными данными
+Скрипт для заполнения базы данных начальными данными.
+С --operations дополнительно генерирует синтетические операции для нагрузочных тестов:
+    python seed_data.py --operations 5000000 --days 365
 """
 
+import argparse
 import asyncio
-import asyncpg
-import hashlib
-import json
+import logging
 import os
 import sys
-from datetime import datetime
+import time
 
 # Добавляем src в путь поиска модулей
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-# Импортируем конфигурацию
-from src.config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS, DEFAULT_ADMIN_PASSWORD, DEFAULT_USER_PASSWORD
+from src.seeding import SyntheticOperations, count_rows, default_fixtures, seed
 
-async def seed_database():
+
+async def seed_database(operations=None):
     try:
         print("Заполнение базы данных начальными данными...")
-        
-        # Подключение к базе данных
-        connection_string = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        conn = await asyncpg.connect(connection_string)
-        print("✓ Успешное подключение к базе данных")
-        
-        # Создаем роли
-        print("\nСоздание базовых ролей...")
-        
-        # Проверяем существование роли admin
-        admin_role_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM role WHERE name = $1)", 
-            "admin"
-        )
-        
-        if not admin_role_exists:
-            admin_role_id = await conn.fetchval(
-                "INSERT INTO role (name, permissions) VALUES ($1, $2) RETURNING id",
-                "admin", 
-                json.dumps({"admin": True, "read": True, "write": True, "delete": True})
-            )
-            print(f"✓ Создана роль admin с id={admin_role_id}")
-        else:
-            admin_role_id = await conn.fetchval("SELECT id FROM role WHERE name = $1", "admin")
-            print(f"ℹ Роль admin уже существует с id={admin_role_id}")
-        
-        # Проверяем существование роли user
-        user_role_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM role WHERE name = $1)", 
-            "user"
-        )
-        
-        if not user_role_exists:
-            user_role_id = await conn.fetchval(
-                "INSERT INTO role (name, permissions) VALUES ($1, $2) RETURNING id",
-                "user",
-                json.dumps({"read": True, "write": True, "delete": False})
-            )
-            print(f"✓ Создана роль user с id={user_role_id}")
-        else:
-            user_role_id = await conn.fetchval("SELECT id FROM role WHERE name = $1", "user")
-            print(f"ℹ Роль user уже существует с id={user_role_id}")
-        
-        # Хэшируем пароли
-        def hash_password(password):
-            return hashlib.sha256(password.encode()).hexdigest()
-        
-        # Создаем пользователей
-        print("\nСоздание базовых пользователей...")
-        
-        # Пользователь admin
-        admin_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM \"user\" WHERE username = $1)", 
-            "admin"
-        )
-        
-        if not admin_exists:
-            await conn.execute(
-                """INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                "admin@example.com",
-                "admin",
-                admin_role_id,
-                hash_password(DEFAULT_ADMIN_PASSWORD),
-                True,  # is_active
-                True,  # is_superuser
-                True,  # is_verified
-                datetime.utcnow()
-            )
-            print("✓ Создан пользователь admin")
-        else:
-            print("ℹ Пользователь admin уже существует")
-        
-        # Пользователь user
-        user_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM \"user\" WHERE username = $1)", 
-            "user"
-        )
-        
-        if not user_exists:
-            await conn.execute(
-                """INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                "user@example.com",
-                "user",
-                user_role_id,
-                hash_password(DEFAULT_USER_PASSWORD),
-                True,  # is_active
-                False, # is_superuser
-                True,  # is_verified
-                datetime.utcnow()
-            )
-            print("✓ Создан пользователь user")
-        else:
-            print("ℹ Пользователь user уже существует")
-        
+
+        started = time.perf_counter()
+        stats = await seed(default_fixtures(operations))
+        elapsed = time.perf_counter() - started
+        print(f"✓ Добавлено ролей: {stats['roles']}, пользователей: {stats['users']}, операций: {stats['operations']}")
+        print(f"Время: {elapsed:.1f} с")
+
         # Проверяем результаты
         print("\nПроверка результатов:")
-        role_count = await conn.fetchval("SELECT COUNT(*) FROM role")
-        user_count = await conn.fetchval("SELECT COUNT(*) FROM \"user\"")
-        print(f"Всего ролей: {role_count}")
-        print(f"Всего пользователей: {user_count}")
-        
-        await conn.close()
+        totals = await count_rows()
+        print(f"Всего ролей: {totals['roles']}")
+        print(f"Всего пользователей: {totals['users']}")
+        print(f"Всего операций: {totals['operations']}")
+
         print("\n✓ Заполнение начальными данными завершено успешно!")
         return True
-        
+
     except Exception as e:
         print(f"✗ Ошибка при заполнении начальными данными: {e}")
         import traceback
@@ -134,11 +45,32 @@ async def seed_database():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=0, help="количество синтетических операций")
+    parser.add_argument("--days", type=int, default=365, help="за сколько последних дней генерировать операции")
+    parser.add_argument("--instruments", type=int, default=500, help="количество разных figi")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="строк в одной пачке COPY")
+    parser.add_argument("--random-seed", type=int, default=None, help="для воспроизводимых данных")
+    args = parser.parse_args()
+
+    operations = None
+    if args.operations:
+        operations = SyntheticOperations(
+            count=args.operations,
+            days=args.days,
+            instruments=args.instruments,
+            chunk_size=args.chunk_size,
+            random_seed=args.random_seed,
+        )
+
+    # Ход записи синтетических операций src.seeding пишет в журнал
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     print("Запуск заполнения базы данных начальными данными...")
     print("=" * 50)
-    
-    result = asyncio.run(seed_database())
-    
+
+    result = asyncio.run(seed_database(operations))
+
     print("=" * 50)
     if result:
         print("Заполнение завершено успешно!")
@@ -1,16 +1,20 @@
+from typing import Optional
+
+from fastapi import Depends, HTTPException
 from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import CookieTransport, AuthenticationBackend
-from fastapi_users.authentication import JWTStrategy
 
-from auth.manager import get_user_manager
-from auth.models import User
-from config import SECRET_AUTH
+from src.auth.manager import get_user_manager
+from src.auth.models import User
+from src.auth.permissions import TokenClaims, permission_bit, role_registry
+from src.auth.strategy import CachingJWTStrategy
+from src.config import SECRET_AUTH
 
 cookie_transport = CookieTransport(cookie_name="bonds", cookie_max_age=3600)
 
 
-def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET_AUTH, lifetime_seconds=3600)
+def get_jwt_strategy() -> CachingJWTStrategy:
+    return CachingJWTStrategy(secret=SECRET_AUTH, lifetime_seconds=3600)
 
 auth_backend = AuthenticationBackend(
     name="jwt",
@@ -24,3 +28,30 @@ fastapi_users = FastAPIUsers[User, int](
 )
 
 current_user = fastapi_users.current_user()
+
+
+def require_permission(permission: str):
+    """
+    Зависимость: роль берется из claims токена, а ее права - из реестра ролей процесса,
+    поэтому изменение прав роли действует сразу. Пока реестр не загружен, используется
+    маска прав из токена; роли, которой нет в загруженном реестре, права не даются.
+    Ни пользователь, ни роль из базы не читаются. Возвращает TokenClaims
+    """
+    bit = permission_bit(permission)
+
+    async def check_permission(token: Optional[str] = Depends(cookie_transport.scheme)) -> TokenClaims:
+        claims = await get_jwt_strategy().read_claims(token)
+        if claims is None:
+            raise HTTPException(status_code=401, detail="Unauthorized")
+        if claims.is_superuser:
+            return claims
+        if role_registry.loaded:
+            role = role_registry.get(claims.role_id)
+            permissions = role.permissions if role is not None else 0
+        else:
+            permissions = claims.permissions
+        if not permissions & bit:
+            raise HTTPException(status_code=403, detail=f"Недостаточно прав: нужно право {permission}")
+        return claims
+
+    return check_permission
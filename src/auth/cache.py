@@ -0,0 +1,160 @@
+"""
+Кэш пользователей для аутентификации по JWT: расшифрованный токен -> запись пользователя.
+Записи живут не дольше TTL и срока действия токена, при переполнении вытесняются
+давно не использованные (LRU).
+Кэш версий токенов: пользователь -> текущий token_version, по нему проверка прав
+из claims отсекает отозванные токены без запроса в базу
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from src.config import (
+    AUTH_TOKEN_VERSION_TTL,
+    AUTH_USER_CACHE_BACKEND,
+    AUTH_USER_CACHE_MAX_SIZE,
+    AUTH_USER_CACHE_TTL,
+)
+from src.notifications import notification_listener, publish
+
+# Канал, через который воркеры сообщают друг другу об изменении пользователя
+USER_INVALIDATION_CHANNEL = "auth_user_invalidate"
+
+
+class UserCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()
+        self._tokens_by_user: Dict[Any, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Any]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user_id, user = entry
+        if expires_at <= time.monotonic():
+            self._remove(token, user_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        if token in self._entries:
+            self._remove(token, self._entries[token][1])
+        self._entries[token] = (time.monotonic() + ttl, user.id, user)
+        self._tokens_by_user.setdefault(user.id, set()).add(token)
+        while len(self._entries) > self.max_size:
+            old_token, (_, old_user_id, _) = self._entries.popitem(last=False)
+            self._discard_token(old_token, old_user_id)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: Any):
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._entries.pop(token, None)
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "backend": AUTH_USER_CACHE_BACKEND,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, token: str, user_id: Any):
+        self._entries.pop(token, None)
+        self._discard_token(token, user_id)
+
+    def _discard_token(self, token: str, user_id: Any):
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+class TokenVersionCache:
+    """
+    Текущие версии токенов пользователей. None - пользователь удален или деактивирован,
+    его токены не принимаются. Без записи в кэше версия читается из базы
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, Tuple[float, Optional[int]]]" = OrderedDict()
+
+    def get(self, user_id: Any) -> Tuple[bool, Optional[int]]:
+        """
+        (найдено ли в кэше, версия)
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self._entries[user_id]
+            return False, None
+        self._entries.move_to_end(user_id)
+        return True, entry[1]
+
+    def set(self, user_id: Any, version: Optional[int]):
+        self._entries[user_id] = (time.monotonic() + self.ttl, version)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: Any):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_cache = UserCache(ttl=AUTH_USER_CACHE_TTL, max_size=AUTH_USER_CACHE_MAX_SIZE)
+token_versions = TokenVersionCache(ttl=AUTH_TOKEN_VERSION_TTL, max_size=AUTH_USER_CACHE_MAX_SIZE)
+
+
+async def invalidate_user(user_id: Any):
+    """
+    Сбрасывает кэш пользователя в текущем процессе, а при общем бэкенде - во всех воркерах
+    """
+    user_cache.invalidate_user(user_id)
+    token_versions.invalidate_user(user_id)
+    if AUTH_USER_CACHE_BACKEND == "postgres":
+        await publish(USER_INVALIDATION_CHANNEL, str(user_id))
+
+
+def _on_user_invalidated(payload: str):
+    user_cache.invalidate_user(int(payload))
+    token_versions.invalidate_user(int(payload))
+
+
+def _clear_caches():
+    user_cache.clear()
+    token_versions.clear()
+
+
+if AUTH_USER_CACHE_BACKEND == "postgres":
+    notification_listener.add_handler(USER_INVALIDATION_CHANNEL, _on_user_invalidated)
+    notification_listener.on_reconnect(_clear_caches)
@@ -1,12 +1,18 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import BaseUserManager, IntegerIDMixin, exceptions, models, schemas
 
-from auth.models import User
-from auth.utils import get_user_db
+from src.auth.cache import invalidate_user
+from src.auth.models import User
+from src.auth.password import run_password_task
+from src.auth.utils import get_user_db
 
-from config import SECRET_AUTH
+from src.config import SECRET_AUTH
+
+# Изменение этих полей отзывает уже выданные токены пользователя
+TOKEN_REVOKING_FIELDS = ("password", "role_id", "is_active", "is_superuser")
 
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
@@ -16,6 +22,13 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     async def on_after_register(self, user: User, request: Optional[Request] = None):
         print(f"User {user.id} has registered.")
 
+    async def on_after_update(self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None):
+        # В том числе деактивация: закэшированный пользователь больше не должен проходить аутентификацию
+        await invalidate_user(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        await invalidate_user(user.id)
+
     async def create(
         self,
         user_create: schemas.UC,
@@ -34,7 +47,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
             else user_create.create_update_dict_superuser()
         )
         password = user_dict.pop("password")
-        user_dict["hashed_password"] = self.password_helper.hash(password)
+        user_dict["hashed_password"] = await run_password_task(self.password_helper.hash, password)
         user_dict["role_id"] = 1
 
         created_user = await self.user_db.create(user_dict)
@@ -43,6 +56,51 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
 
         return created_user
 
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[models.UP]:
+        # То же, что BaseUserManager.authenticate, но хэширование и проверка пароля идут в пуле потоков
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хэшируем пароль и для несуществующего пользователя, чтобы время ответа не выдавало его отсутствие
+            await run_password_task(self.password_helper.hash, credentials.password)
+            return None
+
+        verified, updated_password_hash = await run_password_task(
+            self.password_helper.verify_and_update, credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+
+        return user
+
+    async def _update(self, user: models.UP, update_dict: Dict[str, Any]) -> models.UP:
+        if self._revokes_tokens(user, update_dict):
+            update_dict = dict(update_dict, token_version=(user.token_version or 0) + 1)
+
+        password = update_dict.get("password")
+        if password is None:
+            return await super()._update(user, update_dict)
+
+        # Пароль хэшируется заранее в пуле потоков, дальше базовая реализация сохраняет готовый хэш
+        await self.validate_password(password, user)
+        update_dict = {field: value for field, value in update_dict.items() if field != "password"}
+        update_dict["hashed_password"] = await run_password_task(self.password_helper.hash, password)
+        return await super()._update(user, update_dict)
+
+    @staticmethod
+    def _revokes_tokens(user: models.UP, update_dict: Dict[str, Any]) -> bool:
+        for field in TOKEN_REVOKING_FIELDS:
+            if field not in update_dict:
+                continue
+            if field == "password":
+                if update_dict[field] is not None:
+                    return True
+            elif update_dict[field] != getattr(user, field):
+                return True
+        return False
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
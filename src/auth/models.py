@@ -9,14 +9,14 @@ class Role(Base):
     __tablename__ = "role"
     
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, unique=True)
     permissions = Column(JSON)
 
 class User(SQLAlchemyBaseUserTable[int], Base):
     __tablename__ = "user"
     
     id = Column(Integer, primary_key=True)
-    email = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True)
     username = Column(String, nullable=False)
     registered_at = Column(TIMESTAMP, default=datetime.utcnow)
     role_id = Column(Integer, ForeignKey('role.id'))
@@ -24,3 +24,5 @@ class User(SQLAlchemyBaseUserTable[int], Base):
     is_active: bool = Column(Boolean, default=True, nullable=False)
     is_superuser: bool = Column(Boolean, default=False, nullable=False)
     is_verified: bool = Column(Boolean, default=False, nullable=False)
+    # Увеличивается при смене роли, прав, пароля или деактивации - старые токены перестают приниматься
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
@@ -0,0 +1,23 @@
+"""
+Хэширование и проверка паролей вне цикла событий.
+bcrypt и argon2 отпускают GIL на время вычисления, поэтому пула потоков достаточно,
+а его размер ограничивает число одновременных вычислений на процесс
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from src.config import PASSWORD_HASH_WORKERS
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+async def run_password_task(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Выполняет вызов password_helper в пуле потоков. Если все потоки заняты,
+    вызов ждет в очереди пула, не задерживая остальные корутины
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, partial(func, *args))
@@ -0,0 +1,210 @@
+"""
+Права ролей в компактном виде: каждому праву из Role.permissions соответствует бит.
+Маска прав роли записывается в JWT при входе, поэтому проверка прав не обращается к базе.
+Порядок PERMISSIONS менять нельзя - только дописывать новые права в конец,
+иначе уже выданные токены будут прочитаны неверно.
+
+RoleRegistry держит все роли процесса в памяти (таблица role маленькая и меняется редко):
+загружается при запуске приложения и перечитывается по NOTIFY или при смене контрольной
+суммы таблицы, которую фоновая задача проверяет раз в ROLE_REGISTRY_REFRESH_INTERVAL секунд
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
+
+from sqlalchemy import select, text, update
+
+from src.auth.cache import invalidate_user
+from src.auth.models import Role, User
+from src.config import AUTH_USER_CACHE_BACKEND
+from src.database import async_session_maker
+from src.notifications import notification_listener, publish
+
+logger = logging.getLogger(__name__)
+
+# Канал, через который воркеры сообщают друг другу об изменении ролей
+ROLES_CHANNEL = "auth_roles_changed"
+
+# Контрольная сумма таблицы role: при ее изменении реестр перечитывается
+ROLES_CHECKSUM_SQL = """
+SELECT md5(COALESCE(string_agg(id || ':' || name || ':' || COALESCE(permissions::text, ''), ',' ORDER BY id), ''))
+FROM role
+"""
+
+PERMISSIONS = ("read", "write", "delete", "admin")
+PERMISSION_BITS = {name: 1 << index for index, name in enumerate(PERMISSIONS)}
+ALL_PERMISSIONS = (1 << len(PERMISSIONS)) - 1
+
+# Имена claim в JWT
+ROLE_CLAIM = "role"
+PERMISSIONS_CLAIM = "perm"
+TOKEN_VERSION_CLAIM = "ver"
+SUPERUSER_CLAIM = "su"
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    user_id: int
+    role_id: Optional[int]
+    permissions: int
+    token_version: int
+    is_superuser: bool = False
+
+    def has(self, permission: str) -> bool:
+        return bool(self.permissions & permission_bit(permission))
+
+
+def permission_bit(permission: str) -> int:
+    try:
+        return PERMISSION_BITS[permission]
+    except KeyError:
+        raise ValueError(f"Неизвестное право: {permission}")
+
+
+def permission_mask(permissions: Optional[Dict[str, Any]]) -> int:
+    """
+    Маска из словаря Role.permissions вида {"read": true, "write": false}.
+    Неизвестные права пропускаются
+    """
+    mask = 0
+    for name, allowed in (permissions or {}).items():
+        if allowed and name in PERMISSION_BITS:
+            mask |= PERMISSION_BITS[name]
+    return mask
+
+
+@dataclass(frozen=True)
+class RoleEntry:
+    id: int
+    name: str
+    permissions: int
+
+    def has(self, bit: int) -> bool:
+        return bool(self.permissions & bit)
+
+
+class RoleRegistry:
+    """
+    Роли процесса: id -> RoleEntry с маской прав. При перезагрузке словарь
+    заменяется целиком, поэтому читатели никогда не видят его частично обновленным
+    """
+
+    def __init__(self):
+        self._roles: Mapping[int, RoleEntry] = MappingProxyType({})
+        self._checksum: Optional[str] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.reloads = 0
+
+    def get(self, role_id: Optional[int]) -> Optional[RoleEntry]:
+        return self._roles.get(role_id)
+
+    def by_name(self, name: str) -> Optional[RoleEntry]:
+        return next((role for role in self._roles.values() if role.name == name), None)
+
+    async def load(self):
+        async with async_session_maker() as session:
+            checksum = await session.scalar(text(ROLES_CHECKSUM_SQL))
+            rows = (await session.execute(select(Role.id, Role.name, Role.permissions))).all()
+        self._roles = MappingProxyType({
+            row.id: RoleEntry(id=row.id, name=row.name, permissions=permission_mask(row.permissions))
+            for row in rows
+        })
+        self._checksum = checksum
+        self.loaded = True
+        self.reloads += 1
+        logger.info(f"Загружено ролей: {len(self._roles)}")
+
+    async def refresh_if_changed(self) -> bool:
+        async with async_session_maker() as session:
+            checksum = await session.scalar(text(ROLES_CHECKSUM_SQL))
+        if checksum == self._checksum:
+            return False
+        await self.load()
+        return True
+
+    def schedule_reload(self, payload: str = ""):
+        # Обработчики уведомлений синхронные, поэтому перезагрузка запускается отдельной задачей
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.get_event_loop().create_task(self._reload_safely())
+
+    async def _reload_safely(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Не удалось перечитать роли: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "roles": {role.name: role.permissions for role in self._roles.values()},
+            "reloads": self.reloads,
+        }
+
+
+role_registry = RoleRegistry()
+
+
+async def run_role_refresh(interval: float):
+    """
+    Фоновая проверка контрольной суммы таблицы role
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await role_registry.refresh_if_changed():
+                logger.info("Роли изменились, реестр перечитан")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка проверки изменений ролей: {e}")
+
+
+async def role_permission_mask(role_id: Optional[int]) -> int:
+    if role_id is None:
+        return 0
+    role = role_registry.get(role_id)
+    if role is not None:
+        return role.permissions
+    async with async_session_maker() as session:
+        permissions = await session.scalar(select(Role.permissions).where(Role.id == role_id))
+    return permission_mask(permissions)
+
+
+async def update_role_permissions(role_id: int, permissions: Dict[str, Any]) -> Optional[List[int]]:
+    """
+    Меняет права роли, перечитывает реестр ролей (при AUTH_USER_CACHE_BACKEND=postgres - во всех
+    воркерах) и отзывает токены пользователей роли: их token_version увеличивается.
+    Реестр других воркеров с локальным кэшем обновится только через ROLE_REGISTRY_REFRESH_INTERVAL,
+    а отзыв токенов действует сразу везде. Права ролей нужно менять только здесь
+    (PUT /roles/{role_id}/permissions). Возвращает None, если роли нет
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(
+            update(Role).where(Role.id == role_id).values(permissions=permissions).returning(Role.id)
+        )
+        if result.scalar() is None:
+            return None
+        result = await session.execute(
+            update(User)
+            .where(User.role_id == role_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User.id)
+        )
+        user_ids = list(result.scalars())
+        await session.commit()
+
+    await role_registry.load()
+    if AUTH_USER_CACHE_BACKEND == "postgres":
+        await publish(ROLES_CHANNEL, str(role_id))
+    for user_id in user_ids:
+        await invalidate_user(user_id)
+    return user_ids
+
+
+if AUTH_USER_CACHE_BACKEND == "postgres":
+    notification_listener.add_handler(ROLES_CHANNEL, role_registry.schedule_reload)
+    notification_listener.on_reconnect(role_registry.schedule_reload)
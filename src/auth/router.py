@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from src.auth.base_config import require_permission
+from src.auth.permissions import permission_bit, update_role_permissions
+from src.auth.schemas import RolePermissionsUpdate
+
+router = APIRouter(
+    prefix="/roles",
+    tags=["Auth"],
+    dependencies=[Depends(require_permission("admin"))],
+)
+
+
+@router.put("/{role_id}/permissions")
+async def set_role_permissions(role_id: int, update: RolePermissionsUpdate):
+    """
+    Меняет права роли, например {"permissions": {"read": true, "write": false}}.
+    Уже выданные токены пользователей роли отзываются
+    """
+    try:
+        for name in update.permissions:
+            permission_bit(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    user_ids = await update_role_permissions(role_id, update.permissions)
+    if user_ids is None:
+        raise HTTPException(status_code=404, detail="Роль не найдена")
+    return {"status": "success", "revoked_users": len(user_ids)}
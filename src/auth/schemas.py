@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import Dict, Optional
 
 from fastapi_users import schemas
+from pydantic import BaseModel
 
 
 class UserRead(schemas.BaseUser[int]):
@@ -24,3 +25,7 @@ class UserCreate(schemas.BaseUserCreate):
     is_active: Optional[bool] = True
     is_superuser: Optional[bool] = False
     is_verified: Optional[bool] = False
+
+
+class RolePermissionsUpdate(BaseModel):
+    permissions: Dict[str, bool]
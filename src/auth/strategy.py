@@ -0,0 +1,125 @@
+import time
+from typing import Optional
+
+import jwt
+from fastapi_users import exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from sqlalchemy import select
+
+from src.auth.cache import token_versions, user_cache
+from src.auth.models import User
+from src.auth.permissions import (
+    ALL_PERMISSIONS,
+    PERMISSIONS_CLAIM,
+    ROLE_CLAIM,
+    SUPERUSER_CLAIM,
+    TOKEN_VERSION_CLAIM,
+    TokenClaims,
+    role_permission_mask,
+)
+from src.config import AUTH_USER_CACHE_ENABLED
+from src.database import async_session_maker
+
+
+class CachingJWTStrategy(JWTStrategy):
+    """
+    JWT-стратегия, которая не ходит в базу за пользователем, если токен уже
+    встречался недавно: пользователь берется из кэша по самому токену.
+    В токен записываются роль, маска прав и версия токена пользователя, поэтому
+    проверка прав (read_claims) обходится без чтения пользователя и роли
+    """
+
+    async def write_token(self, user) -> str:
+        permissions = ALL_PERMISSIONS if user.is_superuser else await role_permission_mask(user.role_id)
+        data = {
+            "sub": str(user.id),
+            "aud": self.token_audience,
+            ROLE_CLAIM: user.role_id,
+            PERMISSIONS_CLAIM: permissions,
+            TOKEN_VERSION_CLAIM: user.token_version or 0,
+            SUPERUSER_CLAIM: bool(user.is_superuser),
+        }
+        return generate_jwt(data, self.encode_key, self.lifetime_seconds, algorithm=self.algorithm)
+
+    async def read_token(self, token: Optional[str], user_manager):
+        if token is None:
+            return None
+
+        if AUTH_USER_CACHE_ENABLED:
+            cached_user = user_cache.get(token)
+            if cached_user is not None:
+                return await self._attach(cached_user, user_manager)
+
+        data = self._decode(token)
+        if data is None:
+            return None
+
+        try:
+            user = await user_manager.get(user_manager.parse_id(data["sub"]))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+        # Токен выпущен до смены роли, прав или пароля
+        if data.get(TOKEN_VERSION_CLAIM, 0) != (user.token_version or 0):
+            return None
+
+        if AUTH_USER_CACHE_ENABLED:
+            # Запись не должна пережить сам токен
+            expires_in = data["exp"] - time.time() if "exp" in data else None
+            user_cache.set(token, user, ttl=expires_in)
+        return user
+
+    async def read_claims(self, token: Optional[str]) -> Optional[TokenClaims]:
+        """
+        Права из claims токена. База читается только при промахе кэша версий токенов
+        """
+        if token is None:
+            return None
+        data = self._decode(token)
+        if data is None or PERMISSIONS_CLAIM not in data:
+            return None
+        try:
+            user_id = int(data["sub"])
+        except ValueError:
+            return None
+
+        version = data.get(TOKEN_VERSION_CLAIM, 0)
+        if version != await self._current_token_version(user_id):
+            return None
+        return TokenClaims(
+            user_id=user_id,
+            role_id=data.get(ROLE_CLAIM),
+            permissions=data[PERMISSIONS_CLAIM],
+            token_version=version,
+            is_superuser=bool(data.get(SUPERUSER_CLAIM, False)),
+        )
+
+    def _decode(self, token: str) -> Optional[dict]:
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        return data if data.get("sub") is not None else None
+
+    @staticmethod
+    async def _current_token_version(user_id: int) -> Optional[int]:
+        found, version = token_versions.get(user_id)
+        if found:
+            return version
+        async with async_session_maker() as session:
+            row = (await session.execute(
+                select(User.token_version, User.is_active).where(User.id == user_id)
+            )).first()
+        # Удаленный или деактивированный пользователь: ни одна версия токена не подходит
+        version = row.token_version if row is not None and row.is_active else None
+        token_versions.set(user_id, version)
+        return version
+
+    @staticmethod
+    async def _attach(user, user_manager):
+        # Объект из кэша присоединяется к сессии текущего запроса без запроса в базу,
+        # чтобы его можно было безопасно изменять и сохранять в рамках этого запроса
+        session = getattr(user_manager.user_db, "session", None)
+        if session is None:
+            return user
+        return await session.merge(user, load=False)
@@ -2,8 +2,8 @@ from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.models import User
-from database import get_async_session
+from src.auth.models import User
+from src.database import get_async_session
 
 
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
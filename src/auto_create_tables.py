@@ -5,31 +5,118 @@
 
 from src.database import Base, engine
 import asyncio
-import asyncpg
 import json
 import hashlib
 from datetime import datetime
-from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER, DEFAULT_ADMIN_PASSWORD, DEFAULT_USER_PASSWORD
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.config import OPERATION_PARTITIONING, OPERATION_PARTITIONS_AHEAD, OPERATION_ROLLUPS
+from src.operations.partitions import (
+    IS_PARTITIONED_SQL,
+    PARTITION_COMMAND,
+    PARTITIONS_LOCK_KEY,
+    add_months,
+    ensure_partitions,
+    is_partitioned,
+    partition_statements,
+)
+from src.operations.rollups import refresh_rollups
+from src.seeding import SEED_VERSION, default_fixtures, seed
 
-async def create_tables_and_seed_data():
+# Ключ advisory lock, под которым инициализацию выполняет только один воркер
+SCHEMA_INIT_LOCK_KEY = 7263544511
+
+SCHEMA_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS app_schema_state (
+    id integer PRIMARY KEY,
+    fingerprint text NOT NULL,
+    updated_at timestamp NOT NULL DEFAULT now()
+)
+"""
+
+SAVE_FINGERPRINT_SQL = """
+INSERT INTO app_schema_state (id, fingerprint, updated_at) VALUES (1, :fingerprint, now())
+ON CONFLICT (id) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, updated_at = now()
+"""
+
+
+def schema_fingerprint():
+    """
+    Отпечаток схемы: хэш DDL всех таблиц и индексов из моделей и набора начальных данных.
+    Совпадение с сохраненным в базе отпечатком означает, что инициализация не нужна
+    """
+    # Импортируем модели, чтобы они были зарегистрированы в Base.metadata
+    from src.auth import models as auth_models
+    from src.operations import models as operations_models
+
+    dialect = postgresql.dialect()
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    fixtures = default_fixtures()
+    digest.update(SEED_VERSION.encode())
+    digest.update(json.dumps(fixtures.roles, sort_keys=True).encode())
+    digest.update(json.dumps([user["email"] for user in fixtures.users]).encode())
+    return digest.hexdigest()
+
+
+async def is_schema_current(fingerprint):
+    """
+    Быстрая проверка при запуске: один запрос к базе
+    """
+    try:
+        async with engine.connect() as conn:
+            stored = await conn.scalar(text("SELECT fingerprint FROM app_schema_state WHERE id = 1"))
+    except DBAPIError:
+        # Таблицы app_schema_state еще нет - база не инициализирована
+        return False
+    return stored == fingerprint
+
+
+async def create_tables_and_seed_data(fingerprint=None):
     """
     Создает все таблицы и заполняет их начальными данными, если они еще не существуют
     Это аналог подхода с метаданными из старого проекта
     """
     try:
-        # Импортируем модели, чтобы они были зарегистрированы в Base.metadata
-        from src.auth import models as auth_models
-        from src.operations import models as operations_models
-        
-        # Создаем таблицы
+        fingerprint = fingerprint or schema_fingerprint()
+
         async with engine.begin() as conn:
+            # Остальные воркеры ждут здесь, пока первый не закончит инициализацию
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_INIT_LOCK_KEY})
+            await conn.execute(text(SCHEMA_STATE_DDL))
+            stored = await conn.scalar(text("SELECT fingerprint FROM app_schema_state WHERE id = 1"))
+            if stored == fingerprint:
+                print("База данных уже инициализирована другим процессом")
+                return True
+
+            # Создаем таблицы
             await conn.run_sync(Base.metadata.create_all)
-        print("Все таблицы успешно созданы")
-        
-        # Заполняем начальными данными
-        await seed_initial_data()
-        print("Начальные данные успешно добавлены")
-        
+            # create_all не создает партиции и не пересоздает уже существующую таблицу operation
+            if OPERATION_PARTITIONING:
+                if await is_partitioned(conn):
+                    # Не пересекаться с обслуживанием партиций в других воркерах
+                    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITIONS_LOCK_KEY})
+                    await ensure_partitions(conn)
+                else:
+                    print(f"Таблица operation не секционирована, выполните '{PARTITION_COMMAND}'")
+            if OPERATION_ROLLUPS:
+                # Схема изменилась: сводки могли отстать или только что появиться
+                await refresh_rollups(conn)
+            print("Все таблицы успешно созданы")
+
+            # Заполняем начальными данными в той же транзакции
+            if not await seed_initial_data(conn):
+                raise RuntimeError("Не удалось добавить начальные данные")
+            print("Начальные данные успешно добавлены")
+
+            await conn.execute(text(SAVE_FINGERPRINT_SQL), {"fingerprint": fingerprint})
+
         return True
     except Exception as e:
         print(f"Ошибка при создании таблиц и данных: {e}")
@@ -53,6 +140,14 @@ def sync_create_tables_and_seed_data():
         
         # Создаем все таблицы синхронно
         Base.metadata.create_all(bind=sync_engine)
+        if OPERATION_PARTITIONING:
+            with sync_engine.begin() as conn:
+                if conn.execute(text(IS_PARTITIONED_SQL)).scalar():
+                    now = datetime.utcnow()
+                    for statement in partition_statements(now, add_months(now, OPERATION_PARTITIONS_AHEAD)):
+                        conn.execute(text(statement))
+                else:
+                    print(f"Таблица operation не секционирована, выполните '{PARTITION_COMMAND}'")
         print("Все таблицы успешно созданы (синхронно)")
         
         # Заполняем начальными данными через асинхронный вызов
@@ -66,107 +161,16 @@ def sync_create_tables_and_seed_data():
         traceback.print_exc()
         return False
 
-async def seed_initial_data():
+async def seed_initial_data(conn=None):
     """
-    Асинхронное заполнение начальными данными
+    Асинхронное заполнение начальными данными через общий модуль src.seeding
     """
     try:
-        # Хэшируем пароли
-        def hash_password(password):
-            return hashlib.sha256(password.encode()).hexdigest()
-        
-        connection_string = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        conn = await asyncpg.connect(connection_string)
-        
-        # Создаем роли
-        print("Создание базовых ролей...")
-        
-        # Проверяем существование роли admin
-        admin_role_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM role WHERE name = $1)", 
-            "admin"
-        )
-        
-        if not admin_role_exists:
-            admin_role_id = await conn.fetchval(
-                "INSERT INTO role (name, permissions) VALUES ($1, $2) RETURNING id",
-                "admin", 
-                json.dumps({"admin": True, "read": True, "write": True, "delete": True})
-            )
-            print(f"Создана роль admin с id={admin_role_id}")
-        else:
-            admin_role_id = await conn.fetchval("SELECT id FROM role WHERE name = $1", "admin")
-            print(f"Роль admin уже существует с id={admin_role_id}")
-        
-        # Проверяем существование роли user
-        user_role_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM role WHERE name = $1)", 
-            "user"
-        )
-        
-        if not user_role_exists:
-            user_role_id = await conn.fetchval(
-                "INSERT INTO role (name, permissions) VALUES ($1, $2) RETURNING id",
-                "user",
-                json.dumps({"read": True, "write": True, "delete": False})
-            )
-            print(f"Создана роль user с id={user_role_id}")
-        else:
-            user_role_id = await conn.fetchval("SELECT id FROM role WHERE name = $1", "user")
-            print(f"Роль user уже существует с id={user_role_id}")
-        
-        # Создаем пользователей
-        print("Создание базовых пользователей...")
-        
-        # Пользователь admin
-        admin_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM \"user\" WHERE username = $1)", 
-            "admin"
-        )
-        
-        if not admin_exists:
-            await conn.execute(
-                """INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                "admin@example.com",
-                "admin",
-                admin_role_id,
-                hash_password(DEFAULT_ADMIN_PASSWORD),
-                True,  # is_active
-                True,  # is_superuser
-                True,  # is_verified
-                datetime.now()
-            )
-            print("Создан пользователь admin")
-        else:
-            print("Пользователь admin уже существует")
-        
-        # Пользователь user
-        user_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM \"user\" WHERE username = $1)", 
-            "user"
-        )
-        
-        if not user_exists:
-            await conn.execute(
-                """INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                "user@example.com",
-                "user",
-                user_role_id,
-                hash_password(DEFAULT_USER_PASSWORD),
-                True,  # is_active
-                False, # is_superuser
-                True,  # is_verified
-                datetime.now()
-            )
-            print("Создан пользователь user")
-        else:
-            print("Пользователь user уже существует")
-        
-        await conn.close()
+        print("Создание базовых ролей и пользователей...")
+        stats = await seed(conn=conn)
+        print(f"Создано ролей: {stats['roles']}, пользователей: {stats['users']}")
         return True
-        
+
     except Exception as e:
         print(f"Ошибка при добавлении начальных данных: {e}")
         import traceback
@@ -178,8 +182,13 @@ async def initialize_database_on_startup():
     """
     Инициализирует базу данных при запуске приложения
     """
+    fingerprint = schema_fingerprint()
+    if await is_schema_current(fingerprint):
+        print("Схема базы данных актуальна, инициализация не требуется")
+        return True
+
     print("Проверка и создание таблиц с данными при необходимости...")
-    success = await create_tables_and_seed_data()
+    success = await create_tables_and_seed_data(fingerprint)
     if success:
         print("База данных готова к работе")
     else:
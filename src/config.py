@@ -3,6 +3,11 @@ import os
 
 load_dotenv()
 
+
+def _get_bool(name: str, default: str = "false") -> bool:
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
@@ -14,3 +19,140 @@ SECRET_AUTH = os.environ.get("SECRET_AUTH")
 # Пароли по умолчанию для базовых пользователей
 DEFAULT_ADMIN_PASSWORD = os.environ.get("DEFAULT_ADMIN_PASSWORD", "admin123")
 DEFAULT_USER_PASSWORD = os.environ.get("DEFAULT_USER_PASSWORD", "user123")
+
+# Пагинация и потоковая выдача операций
+OPERATIONS_PAGE_SIZE = int(os.environ.get("OPERATIONS_PAGE_SIZE", "100"))
+OPERATIONS_MAX_PAGE_SIZE = int(os.environ.get("OPERATIONS_MAX_PAGE_SIZE", "1000"))
+OPERATIONS_STREAM_CHUNK_SIZE = int(os.environ.get("OPERATIONS_STREAM_CHUNK_SIZE", "1000"))
+
+# Массовая загрузка операций
+OPERATIONS_BULK_CHUNK_SIZE = int(os.environ.get("OPERATIONS_BULK_CHUNK_SIZE", "5000"))
+OPERATIONS_BULK_MAX_ERRORS = int(os.environ.get("OPERATIONS_BULK_MAX_ERRORS", "1000"))
+
+# Групповая запись одиночных операций (group commit)
+OPERATIONS_GROUP_COMMIT = _get_bool("OPERATIONS_GROUP_COMMIT")
+OPERATIONS_BATCH_MAX_SIZE = int(os.environ.get("OPERATIONS_BATCH_MAX_SIZE", "500"))
+OPERATIONS_BATCH_MAX_DELAY_MS = int(os.environ.get("OPERATIONS_BATCH_MAX_DELAY_MS", "50"))
+OPERATIONS_BATCH_QUEUE_SIZE = int(os.environ.get("OPERATIONS_BATCH_QUEUE_SIZE", "10000"))
+# flush - ответ после записи в базу, enqueue - сразу после постановки в очередь
+OPERATIONS_BATCH_ACK = os.environ.get("OPERATIONS_BATCH_ACK", "flush")
+
+# Помесячное секционирование таблицы operation по дате
+OPERATION_PARTITIONING = _get_bool("OPERATION_PARTITIONING")
+OPERATION_PARTITIONS_AHEAD = int(os.environ.get("OPERATION_PARTITIONS_AHEAD", "3"))
+# 0 - старые партиции не отсоединяются
+OPERATION_PARTITIONS_RETENTION_MONTHS = int(os.environ.get("OPERATION_PARTITIONS_RETENTION_MONTHS", "0"))
+OPERATION_PARTITIONS_ARCHIVE_SCHEMA = os.environ.get("OPERATION_PARTITIONS_ARCHIVE_SCHEMA", "archive")
+OPERATION_PARTITIONS_MAINTENANCE_INTERVAL = int(os.environ.get("OPERATION_PARTITIONS_MAINTENANCE_INTERVAL", "3600"))
+
+# Пул соединений с базой данных (значения по умолчанию совпадают со значениями SQLAlchemy)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# -1 - соединения не пересоздаются по возрасту
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = _get_bool("DB_POOL_PRE_PING")
+# Без пула на стороне приложения, например за PgBouncer
+DB_USE_NULLPOOL = _get_bool("DB_USE_NULLPOOL")
+
+# Реплика для чтения (если DB_REPLICA_HOST не задан, чтение идет с основного сервера)
+DB_REPLICA_HOST = os.environ.get("DB_REPLICA_HOST", "")
+DB_REPLICA_PORT = os.environ.get("DB_REPLICA_PORT", DB_PORT)
+DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_LAG_CHECK_INTERVAL", "1"))
+# Чтение после записи: клиент с недавней записью читает с реплики только после ее репликации
+DB_READ_YOUR_WRITES = _get_bool("DB_READ_YOUR_WRITES", "true")
+
+# Кэши запросов: скомпилированный SQL в SQLAlchemy и подготовленные выражения asyncpg
+DB_QUERY_CACHE_SIZE = int(os.environ.get("DB_QUERY_CACHE_SIZE", "500"))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+# Режим совместимости с PgBouncer в режиме transaction/statement: без кэша подготовленных
+# выражений и с уникальными именами, чтобы они не конфликтовали на общих соединениях сервера
+DB_PGBOUNCER_MODE = _get_bool("DB_PGBOUNCER_MODE")
+
+# Кэш пользователей при аутентификации по JWT. Попадание в кэш не проверяет версию токена,
+# поэтому при нескольких воркерах включайте его только вместе с AUTH_USER_CACHE_BACKEND=postgres
+AUTH_USER_CACHE_ENABLED = _get_bool("AUTH_USER_CACHE_ENABLED")
+AUTH_USER_CACHE_TTL = float(os.environ.get("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_MAX_SIZE = int(os.environ.get("AUTH_USER_CACHE_MAX_SIZE", "10000"))
+# local - кэш в каждом процессе, postgres - плюс сброс во всех воркерах через LISTEN/NOTIFY
+AUTH_USER_CACHE_BACKEND = os.environ.get("AUTH_USER_CACHE_BACKEND", "local")
+
+# Сколько секунд версия токена пользователя хранится в кэше процесса. При AUTH_USER_CACHE_BACKEND=local
+# другие воркеры узнают об отзыве токенов не позже, чем через это время
+AUTH_TOKEN_VERSION_TTL = float(os.environ.get("AUTH_TOKEN_VERSION_TTL", "60"))
+
+# Реестр ролей в памяти процесса: как часто проверять изменения таблицы role, секунд (0 - только по NOTIFY)
+ROLE_REGISTRY_REFRESH_INTERVAL = float(os.environ.get("ROLE_REGISTRY_REFRESH_INTERVAL", "60"))
+# Проверять право write у POST /operations/ и /operations/bulk
+OPERATIONS_REQUIRE_PERMISSIONS = _get_bool("OPERATIONS_REQUIRE_PERMISSIONS")
+
+# Хэширование и проверка паролей в пуле потоков, чтобы не блокировать цикл событий
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Агрегаты по операциям: какие типы увеличивают и уменьшают позицию (через запятую)
+OPERATIONS_BUY_TYPES = [t.strip() for t in os.environ.get("OPERATIONS_BUY_TYPES", "buy").split(",") if t.strip()]
+OPERATIONS_SELL_TYPES = [t.strip() for t in os.environ.get("OPERATIONS_SELL_TYPES", "sell").split(",") if t.strip()]
+# Время жизни ответов агрегатов в кэше клиента и прокси, секунд
+OPERATIONS_AGGREGATE_MAX_AGE = int(os.environ.get("OPERATIONS_AGGREGATE_MAX_AGE", "60"))
+
+# Сводные таблицы по операциям (figi/день и тип/час), из которых читаются агрегаты
+OPERATION_ROLLUPS = _get_bool("OPERATION_ROLLUPS")
+# Как часто и за сколько последних часов сводки пересчитываются по таблице operation
+OPERATION_ROLLUPS_REFRESH_INTERVAL = int(os.environ.get("OPERATION_ROLLUPS_REFRESH_INTERVAL", "300"))
+OPERATION_ROLLUPS_REFRESH_WINDOW_HOURS = int(os.environ.get("OPERATION_ROLLUPS_REFRESH_WINDOW_HOURS", "48"))
+
+# Кэш ответов GET /operations/
+OPERATIONS_CACHE_ENABLED = _get_bool("OPERATIONS_CACHE_ENABLED")
+OPERATIONS_CACHE_TTL = float(os.environ.get("OPERATIONS_CACHE_TTL", "5"))
+OPERATIONS_CACHE_MAX_SIZE = int(os.environ.get("OPERATIONS_CACHE_MAX_SIZE", "1000"))
+# Путь импорта класса общего бэкенда (пусто - только кэш процесса),
+# например src.operations.cache.LocalCacheBackend
+OPERATIONS_CACHE_BACKEND = os.environ.get("OPERATIONS_CACHE_BACKEND", "")
+# local - поколения в каждом процессе, postgres - плюс рассылка записей всем воркерам через LISTEN/NOTIFY
+OPERATIONS_CACHE_INVALIDATION = os.environ.get("OPERATIONS_CACHE_INVALIDATION", "local")
+
+# Выгрузка операций (CSV / Arrow / Parquet): строк в одной пачке курсора
+OPERATIONS_EXPORT_CHUNK_SIZE = int(os.environ.get("OPERATIONS_EXPORT_CHUNK_SIZE", "50000"))
+
+# Лента новых операций (WebSocket / SSE)
+# local - события от записей этого процесса, postgres - NOTIFY из транзакции записи для всех воркеров
+OPERATIONS_FEED_SOURCE = os.environ.get("OPERATIONS_FEED_SOURCE", "local")
+# Размер очереди каждого подписчика и поведение при ее переполнении:
+# drop - отбрасывать самые старые события, disconnect - отключать медленного подписчика
+OPERATIONS_FEED_QUEUE_SIZE = int(os.environ.get("OPERATIONS_FEED_QUEUE_SIZE", "1000"))
+OPERATIONS_FEED_SLOW_CONSUMER = os.environ.get("OPERATIONS_FEED_SLOW_CONSUMER", "drop")
+# Интервал пустых сообщений SSE, чтобы прокси не закрывали простаивающее соединение, секунд
+OPERATIONS_FEED_HEARTBEAT = float(os.environ.get("OPERATIONS_FEED_HEARTBEAT", "15"))
+# Сколько операций одной записи попадает в ленту, вместо остальных подписчики получают событие gap.
+# Ограничивает и память под строки до commit (local), и число NOTIFY (postgres)
+OPERATIONS_FEED_MAX_BULK_ROWS = int(os.environ.get("OPERATIONS_FEED_MAX_BULK_ROWS", "10000"))
+
+# Метрики в формате Prometheus (GET /metrics)
+METRICS_ENABLED = _get_bool("METRICS_ENABLED", "true")
+
+# Трассировка SQL: трасса на каждый HTTP-запрос и заголовок X-Query-Count
+SQL_TRACE_ENABLED = _get_bool("SQL_TRACE_ENABLED")
+# Сколько запросов одной трассы хранится для отчета (счетчик учитывает все)
+SQL_TRACE_MAX_RECORDS = int(os.environ.get("SQL_TRACE_MAX_RECORDS", "200"))
+# Предупреждение, если HTTP-запрос выполнил больше выражений (0 - без проверки)
+SQL_QUERY_BUDGET = int(os.environ.get("SQL_QUERY_BUDGET", "20"))
+# Журнал медленных запросов: порог в миллисекундах (0 - выключен) и доля записываемых в лог
+SQL_SLOW_QUERY_MS = float(os.environ.get("SQL_SLOW_QUERY_MS", "500"))
+SQL_SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SQL_SLOW_QUERY_SAMPLE_RATE", "1.0"))
+
+# Запуск в production (python run_app.py --prod)
+APP_HOST = os.environ.get("APP_HOST", "0.0.0.0")
+APP_PORT = int(os.environ.get("APP_PORT", "8000"))
+# 0 - по числу ядер
+APP_WORKERS = int(os.environ.get("APP_WORKERS", "0"))
+# Воркер перезапускается после стольких запросов (0 - без перезапуска), разброс не дает всем воркерам
+# перезапуститься одновременно. Перезапуск обрывает подписки на ленту (SSE/WebSocket) и сбрасывает
+# кэши в памяти воркера
+APP_MAX_REQUESTS = int(os.environ.get("APP_MAX_REQUESTS", "0"))
+APP_MAX_REQUESTS_JITTER = int(os.environ.get("APP_MAX_REQUESTS_JITTER", "1000"))
+# Сколько секунд при остановке дожидаться уже начатых запросов
+APP_GRACEFUL_TIMEOUT = int(os.environ.get("APP_GRACEFUL_TIMEOUT", "30"))
+# Общий лимит соединений приложения с Postgres на все воркеры (0 - пулы из DB_POOL_SIZE/DB_MAX_OVERFLOW)
+DB_CONNECTION_BUDGET = int(os.environ.get("DB_CONNECTION_BUDGET", "0"))
@@ -1,20 +1,259 @@
-from typing import AsyncGenerator
+import logging
+import time
+import uuid
+from typing import AsyncGenerator, Optional
 
-from sqlalchemy import MetaData
+from fastapi import Request, Response
+from sqlalchemy import MetaData, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
-from config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from config import (
+    DB_HOST,
+    DB_MAX_OVERFLOW,
+    DB_NAME,
+    DB_PASS,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_PORT,
+    DB_PGBOUNCER_MODE,
+    DB_PREPARED_STATEMENT_CACHE_SIZE,
+    DB_QUERY_CACHE_SIZE,
+    DB_READ_YOUR_WRITES,
+    DB_REPLICA_HOST,
+    DB_REPLICA_LAG_CHECK_INTERVAL,
+    DB_REPLICA_MAX_LAG_SECONDS,
+    DB_REPLICA_PORT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_USE_NULLPOOL,
+    DB_USER,
+)
+from src.monitoring.tracing import instrument_engine as instrument_tracing
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+REPLICA_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
 Base = declarative_base()
 
+# Cookie, в которой клиенту возвращается LSN его последней записи
+LAST_WRITE_LSN_COOKIE = "last_write_lsn"
+
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+REPLICA_REPLAYED_SQL = """
+SELECT CASE
+    WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)
+    ELSE pg_current_wal_lsn() >= CAST(:lsn AS pg_lsn)
+END
+"""
+
+
+class PoolMetrics:
+    """
+    Счетчики пула соединений: сколько раз и как долго запросы ждали соединение,
+    сколько выдач пришлось на overflow и сколько ожиданий закончилось таймаутом
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe_checkout(self, wait_seconds: float, overflow: bool):
+        self.checkouts += 1
+        self.wait_seconds_total += wait_seconds
+        if wait_seconds > self.wait_seconds_max:
+            self.wait_seconds_max = wait_seconds
+        if overflow:
+            self.overflow_checkouts += 1
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул, замеряющий время ожидания свободного соединения
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.observe_checkout(time.perf_counter() - started, self.overflow() > 0)
+        return connection
+
+    def recreate(self):
+        # Пул пересоздается при dispose(), счетчики переходят к новому экземпляру
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def get_connect_args() -> dict:
+    """
+    Настройки кэшей подготовленных выражений asyncpg
+    """
+    if DB_PGBOUNCER_MODE:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+    }
+
+
+def create_engine_with_pool(url: str):
+    engine_options = {
+        "connect_args": get_connect_args(),
+        "query_cache_size": DB_QUERY_CACHE_SIZE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_USE_NULLPOOL:
+        return create_async_engine(url, poolclass=NullPool, **engine_options)
+
+    async_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        **engine_options,
+    )
+    async_engine.pool.metrics = PoolMetrics()
+    return async_engine
 
-engine = create_async_engine(DATABASE_URL)
+
+def get_pool_stats(async_engine) -> dict:
+    pool = async_engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pool": type(pool).__name__}
+
+    metrics = pool.metrics
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": metrics.checkouts,
+        "overflow_checkouts": metrics.overflow_checkouts,
+        "timeouts": metrics.timeouts,
+        "wait_seconds_total": round(metrics.wait_seconds_total, 6),
+        "wait_seconds_max": round(metrics.wait_seconds_max, 6),
+    }
+
+
+class ReplicaMonitor:
+    """
+    Следит за отставанием реплики. Результат проверки кэшируется на check_interval секунд,
+    чтобы не делать лишний запрос на каждое чтение
+    """
+
+    def __init__(self, replica_engine, max_lag: float, check_interval: float):
+        self.replica_engine = replica_engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self._available = False
+        self._checked_at = float("-inf")
+
+    async def is_available(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._available
+        self._checked_at = now
+        try:
+            async with self.replica_engine.connect() as conn:
+                self.lag = float(await conn.scalar(text(REPLICA_LAG_SQL)))
+            self._available = self.lag <= self.max_lag
+        except Exception as e:
+            logger.warning(f"Реплика недоступна, чтение идет с основного сервера: {e}")
+            self.lag = None
+            self._available = False
+        return self._available
+
+    async def has_replayed(self, lsn: str) -> bool:
+        try:
+            async with self.replica_engine.connect() as conn:
+                return bool(await conn.scalar(text(REPLICA_REPLAYED_SQL), {"lsn": lsn}))
+        except Exception:
+            # Некорректный LSN в cookie или недоступная реплика - читаем с основного сервера
+            return False
+
+
+engine = create_engine_with_pool(DATABASE_URL)
+instrument_tracing(engine)
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+replica_engine = create_engine_with_pool(REPLICA_DATABASE_URL) if DB_REPLICA_HOST else None
+if replica_engine is not None:
+    instrument_tracing(replica_engine)
+async_read_session_maker = (
+    sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine is not None
+    else async_session_maker
+)
+replica_monitor = (
+    ReplicaMonitor(replica_engine, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_LAG_CHECK_INTERVAL)
+    if replica_engine is not None
+    else None
+)
+
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+async def choose_read_session_maker(last_write_lsn: Optional[str] = None):
+    """
+    Выбирает, откуда читать: с реплики, если она не отстает больше допустимого
+    и (при чтении после записи) уже воспроизвела последнюю запись клиента
+    """
+    if replica_monitor is None or not await replica_monitor.is_available():
+        return async_session_maker
+    if DB_READ_YOUR_WRITES and last_write_lsn and not await replica_monitor.has_replayed(last_write_lsn):
+        return async_session_maker
+    return async_read_session_maker
+
+
+async def get_async_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия для маршрутов, которые только читают данные
+    """
+    session_maker = await choose_read_session_maker(request.cookies.get(LAST_WRITE_LSN_COOKIE))
+    async with session_maker() as session:
+        yield session
+
+
+async def remember_write_lsn(session: AsyncSession, response: Response):
+    """
+    Сохраняет в cookie LSN основного сервера после commit, чтобы следующие чтения
+    этого клиента не ушли на реплику раньше, чем она догонит запись
+    """
+    if replica_engine is None or not DB_READ_YOUR_WRITES:
+        return
+    lsn = await session.scalar(text("SELECT pg_current_wal_lsn()::text"))
+    response.set_cookie(LAST_WRITE_LSN_COOKIE, lsn, max_age=300, httponly=True, samesite="lax")
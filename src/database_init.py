@@ -1,11 +1,8 @@
 import asyncio
 import asyncpg
 import logging
-import json
-import hashlib
 import os
 import sys
-from datetime import datetime
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,6 +14,8 @@ src_dir = os.path.dirname(os.path.abspath(__file__))
 # Импортируем конфигурацию напрямую
 config_path = os.path.join(src_dir, 'config.py')
 sys.path.insert(0, src_dir)
+# Корень проекта нужен для импорта src.seeding
+sys.path.insert(0, os.path.dirname(src_dir))
 
 # Загружаем конфигурацию вручную
 DB_HOST = os.environ.get("DB_HOST", "localhost")
@@ -24,8 +23,6 @@ DB_PORT = os.environ.get("DB_PORT", "5439")
 DB_NAME = os.environ.get("DB_NAME", "postgres")
 DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASS = os.environ.get("DB_PASS", "postgres")
-DEFAULT_ADMIN_PASSWORD = os.environ.get("DEFAULT_ADMIN_PASSWORD", "admin123")
-DEFAULT_USER_PASSWORD = os.environ.get("DEFAULT_USER_PASSWORD", "user123")
 
 async def create_database_if_not_exists():
     """
@@ -92,104 +89,12 @@ async def seed_initial_data():
     - Создает пользователей (admin, user)
     """
     try:
-        # Хэшируем пароли
-        def hash_password(password):
-            return hashlib.sha256(password.encode()).hexdigest()
-        
-        connection_string = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        conn = await asyncpg.connect(connection_string)
-        logger.info("Подключение к базе данных для заполнения начальными данными")
-        
-        # Создаем роли
-        logger.info("Создание базовых ролей...")
-        
-        # Проверяем существование роли admin
-        admin_role_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM role WHERE name = $1)", 
-            "admin"
-        )
-        
-        if not admin_role_exists:
-            admin_role_id = await conn.fetchval(
-                "INSERT INTO role (name, permissions) VALUES ($1, $2) RETURNING id",
-                "admin", 
-                json.dumps({"admin": True, "read": True, "write": True, "delete": True})
-            )
-            logger.info(f"Создана роль admin с id={admin_role_id}")
-        else:
-            admin_role_id = await conn.fetchval("SELECT id FROM role WHERE name = $1", "admin")
-            logger.info(f"Роль admin уже существует с id={admin_role_id}")
-        
-        # Проверяем существование роли user
-        user_role_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM role WHERE name = $1)", 
-            "user"
-        )
-        
-        if not user_role_exists:
-            user_role_id = await conn.fetchval(
-                "INSERT INTO role (name, permissions) VALUES ($1, $2) RETURNING id",
-                "user",
-                json.dumps({"read": True, "write": True, "delete": False})
-            )
-            logger.info(f"Создана роль user с id={user_role_id}")
-        else:
-            user_role_id = await conn.fetchval("SELECT id FROM role WHERE name = $1", "user")
-            logger.info(f"Роль user уже существует с id={user_role_id}")
-        
-        # Создаем пользователей
-        logger.info("Создание базовых пользователей...")
-        
-        # Пользователь admin
-        admin_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM \"user\" WHERE username = $1)", 
-            "admin"
-        )
-        
-        if not admin_exists:
-            await conn.execute(
-                """INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                "admin@example.com",
-                "admin",
-                admin_role_id,
-                hash_password(DEFAULT_ADMIN_PASSWORD),
-                True,  # is_active
-                True,  # is_superuser
-                True,  # is_verified
-                datetime.now()
-            )
-            logger.info("Создан пользователь admin")
-        else:
-            logger.info("Пользователь admin уже существует")
-        
-        # Пользователь user
-        user_exists = await conn.fetchval(
-            "SELECT EXISTS (SELECT 1 FROM \"user\" WHERE username = $1)", 
-            "user"
-        )
-        
-        if not user_exists:
-            await conn.execute(
-                """INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at) 
-                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                "user@example.com",
-                "user",
-                user_role_id,
-                hash_password(DEFAULT_USER_PASSWORD),
-                True,  # is_active
-                False, # is_superuser
-                True,  # is_verified
-                datetime.now()
-            )
-            logger.info("Создан пользователь user")
-        else:
-            logger.info("Пользователь user уже существует")
-        
-        await conn.close()
-        logger.info("Начальные данные успешно добавлены")
+        from src.seeding import seed
+
+        stats = await seed()
+        logger.info(f"Начальные данные добавлены: ролей {stats['roles']}, пользователей {stats['users']}")
         return True
-        
+
     except Exception as e:
         logger.error(f"Ошибка при добавлении начальных данных: {e}")
         import traceback
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import sys
 import os
@@ -16,8 +17,21 @@ if src_path not in sys.path:
 # Импортируем маршруты и конфигурацию с абсолютными путями
 from src.auth.base_config import auth_backend, fastapi_users
 from src.auth.schemas import UserRead, UserCreate
+from src.auth.router import router as router_roles
 from src.operations.router import router as router_operation
+from src.monitoring.router import router as router_monitoring
 from src.auto_create_tables import initialize_database_on_startup
+from src.config import OPERATION_PARTITIONING, OPERATION_PARTITIONS_MAINTENANCE_INTERVAL, OPERATIONS_GROUP_COMMIT
+from src.config import OPERATION_ROLLUPS, OPERATION_ROLLUPS_REFRESH_INTERVAL, OPERATION_ROLLUPS_REFRESH_WINDOW_HOURS
+from src.config import METRICS_ENABLED, ROLE_REGISTRY_REFRESH_INTERVAL, SQL_TRACE_ENABLED
+from src.auth.permissions import role_registry, run_role_refresh
+from src.database import engine, get_pool_stats, replica_engine
+from src.monitoring.metrics import MetricsMiddleware, instrument_engine, register_pool_metrics
+from src.monitoring.tracing import QueryTracingMiddleware
+from src.operations.batching import operation_write_queue
+from src.operations.partitions import run_partition_maintenance
+from src.operations.rollups import run_rollup_refresh
+from src.notifications import notification_listener
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -33,10 +47,46 @@ async def lifespan(app: FastAPI):
         logger.warning(f"Не удалось автоматически инициализировать базу данных: {e}")
         logger.info("Пожалуйста, запустите 'python init_complete.py' вручную для инициализации базы данных")
         pass
-    
+
+    # Роли загружаются один раз, дальше права проверяются по реестру в памяти
+    try:
+        await role_registry.load()
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить роли: {e}")
+
+    if OPERATIONS_GROUP_COMMIT:
+        operation_write_queue.start()
+
+    if notification_listener.has_handlers:
+        try:
+            await notification_listener.start()
+        except Exception as e:
+            logger.warning(f"Не удалось подписаться на уведомления Postgres: {e}")
+
+    # Фоновые задачи обслуживания, останавливаются при завершении приложения
+    background_tasks = []
+    if OPERATION_PARTITIONING:
+        background_tasks.append(
+            asyncio.create_task(run_partition_maintenance(OPERATION_PARTITIONS_MAINTENANCE_INTERVAL))
+        )
+    if ROLE_REGISTRY_REFRESH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(run_role_refresh(ROLE_REGISTRY_REFRESH_INTERVAL)))
+    if OPERATION_ROLLUPS:
+        background_tasks.append(
+            asyncio.create_task(
+                run_rollup_refresh(OPERATION_ROLLUPS_REFRESH_INTERVAL, OPERATION_ROLLUPS_REFRESH_WINDOW_HOURS)
+            )
+        )
+
     yield
-    
-    # Очистка ресурсов при завершении (если нужно)
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
+    # Дописываем операции, накопленные в очереди групповой записи
+    await operation_write_queue.stop()
+    await notification_listener.stop()
     logger.info("Приложение завершает работу")
 
 app = FastAPI(
@@ -57,4 +107,22 @@ app.include_router(
     tags=["Auth"],
 )
 
+app.include_router(router_roles)
+
 app.include_router(router_operation)
+
+app.include_router(router_monitoring)
+
+# Метрики: задержка запросов по маршрутам, SQL-запросы и состояние пулов
+if METRICS_ENABLED:
+    metered_engines = {"primary": engine}
+    if replica_engine is not None:
+        metered_engines["replica"] = replica_engine
+    for database, metered_engine in metered_engines.items():
+        instrument_engine(metered_engine, database)
+    register_pool_metrics(get_pool_stats, metered_engines)
+    app.add_middleware(MetricsMiddleware)
+
+# Трасса SQL-запросов на каждый HTTP-запрос: X-Query-Count и предупреждение о N+1
+if SQL_TRACE_ENABLED:
+    app.add_middleware(QueryTracingMiddleware)
@@ -0,0 +1,263 @@
+"""
+Метрики в текстовом формате Prometheus без сторонних библиотек.
+Гистограммы хранят счетчики в заранее выделенных списках: наблюдение - это поиск
+корзины bisect и два сложения, накопительные суммы считаются только при выдаче /metrics.
+Задержка HTTP-запросов собирается ASGI-middleware по шаблону маршрута, задержка
+и число строк SQL-запросов - событиями движка SQLAlchemy, состояние пула - при выдаче
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Корзины задержки в секундах и числа строк
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Последний элемент - корзина +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float, *label_values: str):
+        self.labels(*label_values).observe(value)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        bucket_names = self.label_names + ("le",)
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(bucket_names, values + (bound,))} {cumulative}"
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for values, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}"
+
+
+class Gauge:
+    """
+    Значение задается напрямую (inc/dec) или функцией, которая вызывается при выдаче
+    и возвращает пары (значения меток, значение). Через функцию можно отдавать и
+    счетчики, которые ведутся в другом месте (metric_type="counter")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        callback: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None,
+        metric_type: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.callback = callback
+        self.metric_type = metric_type
+        self.value = 0
+
+    def inc(self):
+        self.value += 1
+
+    def dec(self):
+        self.value -= 1
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        if self.callback is None:
+            yield f"{self.name} {_format_value(self.value)}"
+            return
+        for values, value in self.callback():
+            yield f"{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+registry = MetricsRegistry()
+
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Запросы, обрабатываемые в данный момент",
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Длительность HTTP-запросов", ("method", "route", "status"),
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Длительность SQL-запросов", ("database", "statement"),
+))
+db_query_rows = registry.register(Histogram(
+    "db_query_rows", "Строк, возвращенных или измененных SQL-запросом", ("database", "statement"), ROWS_BUCKETS,
+))
+db_query_errors = registry.register(Counter(
+    "db_query_errors_total", "SQL-запросы, завершившиеся ошибкой", ("database", "statement"),
+))
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: число запросов в обработке и длительность по шаблону маршрута.
+    Запросы, не совпавшие ни с одним маршрутом, собираются под route="unmatched",
+    чтобы произвольные пути не раздували число рядов
+    """
+
+    def __init__(self, app, excluded_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", None) or "unmatched",
+                status,
+            )
+
+
+def _statement_kind(statement: str) -> str:
+    # Первое слово запроса: SELECT, INSERT, UPDATE, DELETE, COPY...
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "EMPTY"
+
+
+def instrument_engine(async_engine, database: str):
+    """
+    Подписывает движок на события выполнения запросов
+    """
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        kind = _statement_kind(statement)
+        db_query_duration.observe(time.perf_counter() - context._metrics_started, database, kind)
+        # Для серверных курсоров число строк заранее неизвестно (-1)
+        rowcount = getattr(cursor, "rowcount", -1)
+        if rowcount is not None and rowcount >= 0:
+            db_query_rows.observe(rowcount, database, kind)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        db_query_errors.inc(database, _statement_kind(context.statement or ""))
+
+
+def register_pool_metrics(get_pool_stats: Callable[[object], dict], engines: Dict[str, object]):
+    """
+    Состояние пулов соединений, снимаемое в момент выдачи /metrics
+    """
+    def pool_gauge(key: str):
+        def collect():
+            for database, async_engine in engines.items():
+                value = get_pool_stats(async_engine).get(key)
+                if value is not None:
+                    yield (database,), value
+        return collect
+
+    for key, name, metric_type, documentation in (
+        ("size", "db_pool_size", "gauge", "Размер пула соединений"),
+        ("checked_out", "db_pool_checked_out", "gauge", "Выданные из пула соединения"),
+        ("overflow", "db_pool_overflow", "gauge", "Соединения сверх размера пула"),
+        ("checkouts", "db_pool_checkouts_total", "counter", "Выдачи соединений из пула"),
+        ("timeouts", "db_pool_timeouts_total", "counter", "Таймауты ожидания соединения"),
+        ("wait_seconds_total", "db_pool_wait_seconds_total", "counter", "Ожидание соединения, секунд"),
+    ):
+        registry.register(Gauge(name, documentation, ("database",), pool_gauge(key), metric_type))
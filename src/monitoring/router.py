@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from src.auth.cache import user_cache
+from src.auth.permissions import role_registry
+from src.config import METRICS_ENABLED, OPERATION_ROLLUPS, OPERATION_ROLLUPS_REFRESH_WINDOW_HOURS
+from src.database import engine, get_pool_stats, replica_engine, replica_monitor
+from src.monitoring.metrics import CONTENT_TYPE, registry
+from src.operations.cache import response_cache
+from src.operations.feed import operation_feed
+from src.operations.rollups import check_rollups
+
+router = APIRouter(
+    tags=["Monitoring"]
+)
+
+# Сверка сводок читает operation за весь интервал, поэтому он ограничен неделей
+ROLLUPS_CHECK_MAX_HOURS = 24 * 7
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Метрики приложения в текстовом формате Prometheus
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Метрики отключены")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/health/pool")
+async def get_database_pool_stats():
+    """
+    Состояние пула соединений с базой данных
+    """
+    stats = {"primary": get_pool_stats(engine)}
+    if replica_engine is not None:
+        stats["replica"] = get_pool_stats(replica_engine)
+        stats["replica"]["lag_seconds"] = replica_monitor.lag
+    return stats
+
+
+@router.get("/health/cache")
+async def get_cache_stats():
+    """
+    Счетчики попаданий и промахов кэшей
+    """
+    return {
+        "auth_users": user_cache.stats(),
+        "roles": role_registry.stats(),
+        "operations_responses": response_cache.stats(),
+    }
+
+
+@router.get("/health/feed")
+async def get_feed_stats():
+    """
+    Подписчики ленты операций, разосланные и отброшенные события
+    """
+    return operation_feed.stats()
+
+
+@router.get("/health/rollups")
+async def get_rollups_consistency(
+    hours: int = Query(OPERATION_ROLLUPS_REFRESH_WINDOW_HOURS, ge=1, le=ROLLUPS_CHECK_MAX_HOURS),
+):
+    """
+    Сверка сводных таблиц с таблицей operation за последние hours часов
+    """
+    if not OPERATION_ROLLUPS:
+        return {"enabled": False}
+    since = datetime.utcnow() - timedelta(hours=hours)
+    async with engine.connect() as conn:
+        report = await check_rollups(conn, since)
+    return {"enabled": True, **report}
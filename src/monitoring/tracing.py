@@ -0,0 +1,195 @@
+"""
+Трассировка SQL-запросов. Текущая трасса хранится в contextvars, поэтому каждая
+задача asyncio (запрос) видит только свои запросы; SQLAlchemy переносит контекст
+в greenlet, в котором срабатывают события движка.
+
+- QueryTracingMiddleware открывает трассу на каждый HTTP-запрос, отдает число
+  выполненных выражений в заголовке X-Query-Count и предупреждает о превышении
+  бюджета SQL_QUERY_BUDGET (типичный признак N+1). Фоновые задачи (групповая запись,
+  пересчет сводок) выполняются вне трассы запроса и в X-Query-Count не входят.
+- Медленные запросы (дольше SQL_SLOW_QUERY_MS) пишутся в лог с долей выборки
+  SQL_SLOW_QUERY_SAMPLE_RATE. Значения параметров не логируются, только их форма.
+- capture_queries и assert_max_queries - для проверки бюджета запросов в тестах
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+
+from src.config import (
+    SQL_QUERY_BUDGET,
+    SQL_SLOW_QUERY_MS,
+    SQL_SLOW_QUERY_SAMPLE_RATE,
+    SQL_TRACE_MAX_RECORDS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = b"x-query-count"
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    parameters: str
+    duration: float
+    rows: int
+
+
+class QueryTrace:
+    """
+    Запросы одного HTTP-запроса или блока кода. Вложенная трасса передает
+    свои записи внешней, поэтому тест видит и запросы, выполненные внутри приложения
+    """
+
+    def __init__(self, label: str = "", parent: Optional["QueryTrace"] = None, max_records: int = SQL_TRACE_MAX_RECORDS):
+        self.label = label
+        self.parent = parent
+        self.max_records = max_records
+        self.records: List[QueryRecord] = []
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, query: QueryRecord):
+        self.count += 1
+        self.duration += query.duration
+        if len(self.records) < self.max_records:
+            self.records.append(query)
+        if self.parent is not None:
+            self.parent.record(query)
+
+    def repeated(self, min_count: int = 2):
+        """
+        Выражения, выполненные не меньше min_count раз, по убыванию числа повторов
+        """
+        counts = Counter(query.statement for query in self.records)
+        return [(statement, count) for statement, count in counts.most_common() if count >= min_count]
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f"{self.count} SQL-запросов за {self.duration * 1000:.1f} мс"]
+        for statement, count in self.repeated()[:limit]:
+            lines.append(f"  {count} x {_shorten(statement)}")
+        return "\n".join(lines)
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("sql_query_trace", default=None)
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def capture_queries(label: str = "") -> Iterator[QueryTrace]:
+    """
+    Собирает все SQL-запросы, выполненные в текущем контексте внутри блока
+    """
+    trace = QueryTrace(label, parent=_current_trace.get())
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "") -> Iterator[QueryTrace]:
+    """
+    Для тестов: блок должен выполнить не больше limit SQL-запросов
+    """
+    with capture_queries(label) as trace:
+        yield trace
+    if trace.count > limit:
+        raise AssertionError(f"Превышен бюджет запросов ({limit}): {trace.summary()}")
+
+
+def _shorten(statement: str, length: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= length else statement[:length] + "..."
+
+
+def parameters_shape(parameters, executemany: bool) -> str:
+    # Только имена и количество параметров: значения могут содержать пароли и личные данные
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{len(parameters)} x {parameters_shape(parameters[0], False)}"
+    if isinstance(parameters, dict):
+        return "(" + ", ".join(sorted(str(key) for key in parameters)) + ")"
+    if isinstance(parameters, (list, tuple)):
+        return f"({len(parameters)} позиционных)"
+    return "()"
+
+
+def instrument_engine(async_engine):
+    """
+    Подписывает движок на события выполнения запросов для трассировки и журнала медленных запросов
+    """
+    sync_engine = async_engine.sync_engine
+    slow_threshold = SQL_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._trace_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._trace_started
+        trace = _current_trace.get()
+        slow = slow_threshold > 0 and duration >= slow_threshold
+        if trace is None and not slow:
+            return
+
+        rowcount = getattr(cursor, "rowcount", -1)
+        query = QueryRecord(
+            statement=statement,
+            parameters=parameters_shape(parameters, executemany),
+            duration=duration,
+            rows=rowcount if rowcount is not None else -1,
+        )
+        if trace is not None:
+            trace.record(query)
+        if slow and random.random() < SQL_SLOW_QUERY_SAMPLE_RATE:
+            logger.warning(
+                f"Медленный SQL-запрос {duration * 1000:.1f} мс, строк {query.rows}"
+                f"{' в ' + trace.label if trace is not None and trace.label else ''}: "
+                f"{_shorten(statement)} параметры {query.parameters}"
+            )
+
+
+class QueryTracingMiddleware:
+    """
+    ASGI-middleware: трасса SQL-запросов на каждый HTTP-запрос. Для потоковых ответов
+    X-Query-Count учитывает только запросы до начала ответа, бюджет - все
+    """
+
+    def __init__(self, app, budget: int = SQL_QUERY_BUDGET):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = QueryTrace(f"{scope['method']} {scope['path']}", parent=_current_trace.get())
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER, str(trace.count).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current_trace.reset(token)
+            if self.budget and trace.count > self.budget:
+                logger.warning(f"Возможен N+1: {trace.label} превысил бюджет {self.budget}. {trace.summary()}")
@@ -0,0 +1,105 @@
+"""
+Обмен уведомлениями между процессами-воркерами через Postgres LISTEN/NOTIFY.
+Один слушатель на процесс держит выделенное соединение asyncpg и раздает
+уведомления обработчикам, зарегистрированным на каналы
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import asyncpg
+from sqlalchemy import text
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.database import engine
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 5
+
+
+class PgNotificationListener:
+    """
+    Слушатель уведомлений Postgres. При потере соединения переподключается
+    и вызывает обработчики on_reconnect: пропущенные за это время уведомления
+    уже не придут, и зависящие от них кэши нужно сбросить
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._handlers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._reconnect_handlers: List[Callable[[], None]] = []
+        self._connection = None
+        self._reconnect_task = None
+        self._stopping = False
+
+    @property
+    def has_handlers(self) -> bool:
+        return bool(self._handlers)
+
+    def add_handler(self, channel: str, handler: Callable[[str], None]):
+        self._handlers[channel].append(handler)
+
+    def on_reconnect(self, handler: Callable[[], None]):
+        self._reconnect_handlers.append(handler)
+
+    async def start(self):
+        self._stopping = False
+        await self._connect()
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    async def _connect(self):
+        connection = await asyncpg.connect(self.dsn)
+        for channel in self._handlers:
+            await connection.add_listener(channel, self._dispatch)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+        logger.info(f"Подписка на уведомления Postgres: {', '.join(self._handlers)}")
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике уведомления {channel}: {e}")
+
+    def _on_termination(self, connection):
+        if self._stopping:
+            return
+        logger.warning("Соединение слушателя уведомлений Postgres потеряно, переподключение...")
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._stopping:
+            await asyncio.sleep(RECONNECT_DELAY)
+            try:
+                await self._connect()
+            except Exception as e:
+                logger.warning(f"Не удалось переподключиться к Postgres для уведомлений: {e}")
+                continue
+            for handler in self._reconnect_handlers:
+                handler()
+            return
+
+
+async def publish(channel: str, payload: str):
+    """
+    Отправляет уведомление всем процессам, включая текущий
+    """
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+
+notification_listener = PgNotificationListener(
+    f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
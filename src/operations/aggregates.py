@@ -0,0 +1,306 @@
+"""
+Агрегаты по операциям, которые считаются в базе: позиции по инструментам,
+объемы по типам и суммы по интервалам времени (date_trunc).
+Как и в queries.py, запрос строится один раз для каждого набора фильтров и группировок.
+При OPERATION_ROLLUPS запросы, которые можно ответить по сводным таблицам
+(фильтры и интервалы кратны их шагу), читают сводки вместо таблицы operation
+"""
+
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, Integer, bindparam, case, cast, func, literal_column, select
+
+from src.config import OPERATION_ROLLUPS, OPERATIONS_BUY_TYPES, OPERATIONS_SELL_TYPES
+from src.operations.models import Operation, OperationDailyFigi, OperationHourlyType
+
+
+class AggregateGroup(str, Enum):
+    type = "type"
+    figi = "figi"
+    instrument_type = "instrument_type"
+
+
+class TimeBucket(str, Enum):
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+def _apply_filters_and_limit(
+    query, date_column, has_type: bool, has_figi: bool, has_date_from: bool, has_date_to: bool
+):
+    table = date_column.class_
+    if has_type:
+        query = query.where(table.type == bindparam("operation_type"))
+    if has_figi:
+        query = query.where(table.figi == bindparam("figi"))
+    if has_date_from:
+        query = query.where(date_column >= bindparam("date_from"))
+    if has_date_to:
+        query = query.where(date_column < bindparam("date_to"))
+    return query.limit(bindparam("limit", type_=Integer))
+
+
+def _bucket_column(bucket: "TimeBucket", date_column):
+    # Интервал подставляется в SQL литералом: с параметром Postgres не сопоставит
+    # выражение в SELECT и GROUP BY
+    return func.date_trunc(literal_column(f"'{bucket.value}'"), date_column).label("bucket")
+
+
+def _total(column, label: str):
+    return cast(func.sum(column), BigInteger).label(label)
+
+
+def _filter_params(
+    operation_type: Optional[str],
+    figi: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    limit: int,
+) -> Dict[str, Any]:
+    params = {"limit": limit}
+    if operation_type is not None:
+        params["operation_type"] = operation_type
+    if figi is not None:
+        params["figi"] = figi
+    if date_from is not None:
+        params["date_from"] = date_from
+    if date_to is not None:
+        params["date_to"] = date_to
+    return params
+
+
+@lru_cache(maxsize=None)
+def positions_statement(has_figi: bool, has_date_from: bool, has_date_to: bool):
+    """
+    Чистая позиция по figi: покупки со знаком плюс, продажи со знаком минус.
+    Операции других типов (дивиденды, комиссии) и операции без figi или даты в позицию не входят
+    (как и в сводке инструмент/день)
+    """
+    signed_quantity = case(
+        (Operation.type.in_(OPERATIONS_SELL_TYPES), -Operation.quantity),
+        else_=Operation.quantity,
+    )
+    query = (
+        select(
+            Operation.figi,
+            func.coalesce(func.sum(signed_quantity), 0).label("position"),
+            func.count().label("operations"),
+        )
+        .where(
+            Operation.type.in_(OPERATIONS_BUY_TYPES + OPERATIONS_SELL_TYPES),
+            Operation.figi.isnot(None),
+            Operation.date.isnot(None),
+        )
+        .group_by(Operation.figi)
+        .order_by(Operation.figi)
+    )
+    return _apply_filters_and_limit(query, Operation.date, False, has_figi, has_date_from, has_date_to)
+
+
+@lru_cache(maxsize=None)
+def volumes_statement(
+    group_by: Tuple[AggregateGroup, ...], has_figi: bool, has_date_from: bool, has_date_to: bool
+):
+    """
+    Количество операций и суммарный объем по типу и дополнительным полям группировки.
+    Операции без типа или даты не учитываются (как и в сводке тип/час)
+    """
+    columns = [Operation.type] + [getattr(Operation, group.value) for group in group_by]
+    query = (
+        select(*columns, func.count().label("operations"), func.sum(Operation.quantity).label("volume"))
+        .where(Operation.type.isnot(None), Operation.date.isnot(None))
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+    return _apply_filters_and_limit(query, Operation.date, False, has_figi, has_date_from, has_date_to)
+
+
+@lru_cache(maxsize=None)
+def buckets_statement(
+    bucket: TimeBucket,
+    group_by: Tuple[AggregateGroup, ...],
+    has_type: bool,
+    has_figi: bool,
+    has_date_from: bool,
+    has_date_to: bool,
+    required: Tuple[AggregateGroup, ...] = (),
+):
+    """
+    Количество, объем и разброс quantity по интервалам времени.
+    Операции без даты не учитываются, как и операции с пустыми полями из required
+    """
+    bucket_column = _bucket_column(bucket, Operation.date)
+    columns = [getattr(Operation, group.value) for group in group_by]
+    query = (
+        select(
+            bucket_column,
+            *columns,
+            func.count().label("operations"),
+            func.sum(Operation.quantity).label("volume"),
+            func.min(Operation.quantity).label("min_quantity"),
+            func.max(Operation.quantity).label("max_quantity"),
+        )
+        .where(Operation.date.isnot(None), *(getattr(Operation, group.value).isnot(None) for group in required))
+        .group_by(bucket_column, *columns)
+        .order_by(bucket_column, *columns)
+    )
+    return _apply_filters_and_limit(query, Operation.date, has_type, has_figi, has_date_from, has_date_to)
+
+
+@lru_cache(maxsize=None)
+def positions_rollup_statement(has_figi: bool, has_date_from: bool, has_date_to: bool):
+    """
+    Позиции по сводке инструмент/день
+    """
+    table = OperationDailyFigi
+    query = (
+        select(table.figi, func.sum(table.position).label("position"), _total(table.position_operations, "operations"))
+        .group_by(table.figi)
+        .having(func.sum(table.position_operations) > 0)
+        .order_by(table.figi)
+    )
+    return _apply_filters_and_limit(query, table.day, False, has_figi, has_date_from, has_date_to)
+
+
+@lru_cache(maxsize=None)
+def volumes_rollup_statement(has_date_from: bool, has_date_to: bool):
+    """
+    Объемы по типам по сводке тип/час
+    """
+    table = OperationHourlyType
+    query = (
+        select(table.type, _total(table.operations, "operations"), func.sum(table.volume).label("volume"))
+        .group_by(table.type)
+        .order_by(table.type)
+    )
+    return _apply_filters_and_limit(query, table.hour, False, False, has_date_from, has_date_to)
+
+
+@lru_cache(maxsize=None)
+def buckets_rollup_statement(
+    date_column,
+    bucket: TimeBucket,
+    group_by: Tuple[AggregateGroup, ...],
+    has_type: bool,
+    has_figi: bool,
+    has_date_from: bool,
+    has_date_to: bool,
+):
+    """
+    Интервалы по одной из сводок: более крупный интервал собирается из строк сводки
+    """
+    table = date_column.class_
+    bucket_column = _bucket_column(bucket, date_column)
+    columns = [getattr(table, group.value) for group in group_by]
+    query = (
+        select(
+            bucket_column,
+            *columns,
+            _total(table.operations, "operations"),
+            func.sum(table.volume).label("volume"),
+            func.min(table.min_quantity).label("min_quantity"),
+            func.max(table.max_quantity).label("max_quantity"),
+        )
+        .group_by(bucket_column, *columns)
+        .order_by(bucket_column, *columns)
+    )
+    return _apply_filters_and_limit(query, date_column, has_type, has_figi, has_date_from, has_date_to)
+
+
+def _aligned(step: TimeBucket, *values: Optional[datetime]) -> bool:
+    # Граница периода должна совпадать с границей строки сводки, иначе ответ будет неточным
+    for value in values:
+        if value is None:
+            continue
+        if value.minute or value.second or value.microsecond:
+            return False
+        if step == TimeBucket.day and value.hour:
+            return False
+    return True
+
+
+def _normalize_groups(group_by: Sequence[AggregateGroup], exclude: Tuple[AggregateGroup, ...] = ()):
+    # Порядок и повторы полей не должны порождать разные запросы
+    return tuple(group for group in AggregateGroup if group in group_by and group not in exclude)
+
+
+def build_positions_query(
+    figi: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime], limit: int
+) -> Tuple[Any, Dict[str, Any]]:
+    flags = (figi is not None, date_from is not None, date_to is not None)
+    if OPERATION_ROLLUPS and _aligned(TimeBucket.day, date_from, date_to):
+        statement = positions_rollup_statement(*flags)
+    else:
+        statement = positions_statement(*flags)
+    return statement, _filter_params(None, figi, date_from, date_to, limit)
+
+
+def build_volumes_query(
+    group_by: Sequence[AggregateGroup],
+    figi: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    limit: int,
+) -> Tuple[Any, Dict[str, Any]]:
+    groups = _normalize_groups(group_by, exclude=(AggregateGroup.type,))
+    if OPERATION_ROLLUPS and not groups and figi is None and _aligned(TimeBucket.hour, date_from, date_to):
+        statement = volumes_rollup_statement(date_from is not None, date_to is not None)
+    else:
+        statement = volumes_statement(groups, figi is not None, date_from is not None, date_to is not None)
+    return statement, _filter_params(None, figi, date_from, date_to, limit)
+
+
+def _bucket_rollup(bucket, groups, operation_type, figi, date_from, date_to):
+    """
+    Столбец времени сводки, по которой можно посчитать интервалы, или None
+    """
+    if bucket == TimeBucket.minute:
+        return None
+    if set(groups) <= {AggregateGroup.type} and figi is None and _aligned(TimeBucket.hour, date_from, date_to):
+        return OperationHourlyType.hour
+    if (
+        bucket != TimeBucket.hour
+        and set(groups) <= {AggregateGroup.figi}
+        and operation_type is None
+        and _aligned(TimeBucket.day, date_from, date_to)
+    ):
+        return OperationDailyFigi.day
+    return None
+
+
+def _bucket_required_groups(groups, operation_type, figi) -> Tuple[AggregateGroup, ...]:
+    """
+    Поля, без которых операция не попадает в сводку, подходящую для запроса такого вида.
+    Запрос к operation отбрасывает такие операции так же, поэтому ответ не зависит от того,
+    прочитан он из сводки или из operation
+    """
+    if set(groups) <= {AggregateGroup.type} and figi is None:
+        return (AggregateGroup.type,)
+    if set(groups) <= {AggregateGroup.figi} and operation_type is None:
+        return (AggregateGroup.figi,)
+    return ()
+
+
+def build_buckets_query(
+    bucket: TimeBucket,
+    group_by: Sequence[AggregateGroup],
+    operation_type: Optional[str],
+    figi: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    limit: int,
+) -> Tuple[Any, Dict[str, Any]]:
+    groups = _normalize_groups(group_by)
+    flags = (operation_type is not None, figi is not None, date_from is not None, date_to is not None)
+    date_column = _bucket_rollup(bucket, groups, operation_type, figi, date_from, date_to) if OPERATION_ROLLUPS else None
+    if date_column is not None:
+        statement = buckets_rollup_statement(date_column, bucket, groups, *flags)
+    else:
+        statement = buckets_statement(bucket, groups, *flags, _bucket_required_groups(groups, operation_type, figi))
+    return statement, _filter_params(operation_type, figi, date_from, date_to, limit)
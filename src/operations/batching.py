@@ -0,0 +1,153 @@
+"""
+Групповая запись одиночных операций (group commit).
+POST /operations/ кладет операцию в очередь, фоновая задача записывает
+накопленное одной транзакцией при достижении порога по размеру или по времени
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import (
+    OPERATIONS_BATCH_ACK,
+    OPERATIONS_BATCH_MAX_DELAY_MS,
+    OPERATIONS_BATCH_MAX_SIZE,
+    OPERATIONS_BATCH_QUEUE_SIZE,
+    OPERATIONS_CACHE_ENABLED,
+)
+from src.database import async_session_maker
+from src.operations.bulk import bulk_transaction, write_operations
+from src.operations.cache import response_cache
+from src.operations.feed import FeedBatch
+
+logger = logging.getLogger(__name__)
+
+ACK_AFTER_FLUSH = "flush"
+ACK_ON_ENQUEUE = "enqueue"
+
+_STOP = object()
+
+
+class OperationWriteQueue:
+    """
+    Очередь операций с фоновым сбросом пачками.
+    В режиме ack=flush submit ждет фактической записи в базу,
+    в режиме ack=enqueue возвращается сразу после постановки в очередь
+    """
+
+    def __init__(self, max_batch_size: int, max_delay: float, ack_mode: str, max_queue_size: int):
+        if ack_mode not in (ACK_AFTER_FLUSH, ACK_ON_ENQUEUE):
+            raise ValueError(f"Неизвестный режим подтверждения записи: {ack_mode}")
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.ack_mode = ack_mode
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        # Очередь создается здесь, чтобы быть привязанной к циклу событий приложения
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Групповая запись операций включена: пачка до {self.max_batch_size}, "
+            f"задержка до {self.max_delay * 1000:.0f} мс, подтверждение '{self.ack_mode}'"
+        )
+
+    async def stop(self):
+        """
+        Останавливает фоновую задачу, предварительно записав все накопленные операции
+        """
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, values: Dict[str, Any]):
+        if not self.running:
+            raise RuntimeError("Очередь групповой записи не запущена")
+        future = asyncio.get_running_loop().create_future() if self.ack_mode == ACK_AFTER_FLUSH else None
+        # При переполненной очереди put ждет, создавая обратное давление на клиентов
+        await self._queue.put((values, future))
+        if future is not None:
+            await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect_batch(self) -> Tuple[List[Tuple[Dict[str, Any], Optional[asyncio.Future]]], bool]:
+        item = await self._queue.get()
+        if item is _STOP:
+            return self._drain(), True
+
+        batch = [item]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch + self._drain(), True
+            batch.append(item)
+        return batch, False
+
+    def _drain(self) -> List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]:
+        items = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                items.append(item)
+        return items
+
+    async def _flush(self, batch):
+        rows = [values for values, _ in batch]
+        feed = FeedBatch()
+        try:
+            async with async_session_maker() as session:
+                async with bulk_transaction(session) as driver_connection:
+                    for start in range(0, len(rows), self.max_batch_size):
+                        await write_operations(
+                            session, driver_connection, rows[start:start + self.max_batch_size], feed
+                        )
+                await session.commit()
+        except Exception as e:
+            if self.ack_mode == ACK_ON_ENQUEUE:
+                logger.error(f"Не удалось записать пачку из {len(rows)} операций, данные потеряны: {e}")
+            else:
+                logger.error(f"Не удалось записать пачку из {len(rows)} операций: {e}")
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        if OPERATIONS_CACHE_ENABLED:
+            try:
+                await response_cache.invalidate(row["type"] for row in rows)
+            except Exception as e:
+                logger.error(f"Не удалось сбросить кэш ответов после записи пачки: {e}")
+        feed.publish_committed()
+
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+operation_write_queue = OperationWriteQueue(
+    max_batch_size=OPERATIONS_BATCH_MAX_SIZE,
+    max_delay=OPERATIONS_BATCH_MAX_DELAY_MS / 1000,
+    ack_mode=OPERATIONS_BATCH_ACK,
+    max_queue_size=OPERATIONS_BATCH_QUEUE_SIZE,
+)
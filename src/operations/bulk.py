@@ -0,0 +1,176 @@
+"""
+Массовая запись операций: разбор входного потока, валидация построчно
+и запись пачками через COPY (asyncpg) или executemany
+"""
+
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.config import OPERATION_ROLLUPS
+from src.operations.feed import FeedBatch
+from src.operations.models import Operation
+from src.operations.rollups import apply_rollups
+from src.operations.schemas import OperationCreate
+from src.serialization import is_msgpack_body, msgpack
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+# Порядок колонок для COPY должен совпадать с порядком значений в записи
+COPY_COLUMNS = ("quantity", "figi", "instrument_type", "date", "type")
+COPY_COLUMNS_WITH_ID = ("id",) + COPY_COLUMNS
+
+# COPY не возвращает id, поэтому для событий ленты они берутся из последовательности заранее
+RESERVE_IDS_SQL = "SELECT nextval('operation_id_seq') FROM generate_series(1, $1)"
+
+
+async def iter_bulk_payload(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Отдает элементы тела запроса вместе с их порядковым номером.
+    NDJSON и поток объектов MessagePack читаются по мере поступления,
+    JSON ожидается массивом
+    """
+    if is_msgpack_body(request):
+        async for item in _iter_msgpack_payload(request):
+            yield item
+        return
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _parse_ndjson_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _parse_ndjson_line(buffer)
+        return
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Тело запроса не является корректным JSON")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив операций")
+    for index, item in enumerate(payload):
+        yield index, item
+
+
+async def _iter_msgpack_payload(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    # Unpacker разбирает объекты прямо из поступающих кусков тела без склейки буфера.
+    # Тело - либо один массив операций, либо идущие подряд объекты-операции
+    unpacker = msgpack.Unpacker(raw=False)
+    index = 0
+    try:
+        async for chunk in request.stream():
+            unpacker.feed(chunk)
+            for payload in unpacker:
+                for item in payload if isinstance(payload, list) else (payload,):
+                    yield index, item
+                    index += 1
+    except (ValueError, msgpack.UnpackException) as e:
+        raise HTTPException(status_code=400, detail=f"Некорректное тело MessagePack: {e}")
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        # Некорректная строка не прерывает разбор, а попадает в список ошибок
+        return ValueError(f"Некорректная строка NDJSON: {e}")
+
+
+def validate_operation(item: Any) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Проверяет одну запись и возвращает (значения, ошибки)
+    """
+    if isinstance(item, ValueError):
+        return {}, [{"type": "json_invalid", "msg": str(item)}]
+    if not isinstance(item, dict):
+        return {}, [{"type": "dict_type", "msg": "Ожидается JSON-объект"}]
+    try:
+        return OperationCreate(**item).dict(), []
+    except ValidationError as e:
+        # Через json(), чтобы в отчет не попали несериализуемые объекты исключений
+        return {}, json.loads(e.json())
+
+
+@asynccontextmanager
+async def bulk_transaction(session: AsyncSession):
+    """
+    Открывает транзакцию на уровне драйвера, в которой выполняются все пачки COPY.
+    Без нее каждый COPY ушел бы в autocommit. Внешней остается транзакция
+    SQLAlchemy, поэтому данные фиксируются только session.commit()
+    """
+    async with driver_transaction(await session.connection()) as driver_connection:
+        yield driver_connection
+
+
+@asynccontextmanager
+async def driver_transaction(connection: AsyncConnection):
+    """
+    То же для соединения SQLAlchemy: отдает соединение asyncpg внутри его транзакции
+    или None, если драйвер не поддерживает COPY.
+    Транзакция драйвера - это savepoint внутри транзакции SQLAlchemy: на выходе он
+    только освобождается, а фиксирует все вместе commit соединения или сессии
+    """
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    if not hasattr(driver_connection, "copy_records_to_table"):
+        yield None
+        return
+    if not driver_connection.is_in_transaction():
+        # Адаптер asyncpg в SQLAlchemy начинает транзакцию лениво, при первом запросе.
+        # Если первой начать транзакцию драйвера, следующий запрос через SQLAlchemy
+        # (сводки, NOTIFY) откроет savepoint, который после COMMIT драйвера уже не освободить
+        await connection.exec_driver_sql("SELECT 1")
+    async with driver_connection.transaction():
+        yield driver_connection
+
+
+async def write_operations(
+    session: AsyncSession, driver_connection, rows: List[Dict[str, Any]], feed: Optional[FeedBatch] = None
+) -> int:
+    """
+    Записывает пачку операций внутри bulk_transaction без commit.
+    Для asyncpg используется COPY, для остальных драйверов - executemany.
+    Сводные таблицы и события ленты обновляются в той же транзакции.
+    Если пачка попадет в ленту, строки получают id записанных операций
+    """
+    if not rows:
+        return 0
+
+    with_ids = feed is not None and feed.accepts(len(rows))
+    if driver_connection is not None:
+        columns = COPY_COLUMNS
+        if with_ids:
+            ids = await driver_connection.fetch(RESERVE_IDS_SQL, len(rows))
+            for row, record in zip(rows, ids):
+                row["id"] = record[0]
+            columns = COPY_COLUMNS_WITH_ID
+        records = [tuple(row[column] for column in columns) for row in rows]
+        await driver_connection.copy_records_to_table(
+            Operation.__tablename__, records=records, columns=columns
+        )
+    elif with_ids:
+        result = await session.execute(insert(Operation).returning(Operation.id, sort_by_parameter_order=True), rows)
+        for row, operation_id in zip(rows, result.scalars()):
+            row["id"] = operation_id
+    else:
+        await session.execute(insert(Operation), rows)
+    if OPERATION_ROLLUPS:
+        await apply_rollups(session, rows)
+    if feed is not None:
+        await feed.add(session, rows, driver_connection)
+    return len(rows)
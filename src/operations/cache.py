@@ -0,0 +1,208 @@
+"""
+Кэш ответов GET /operations/. Ключ - нормализованные параметры запроса и поколение
+типа операции: каждая запись операций этого типа увеличивает поколение, и старые
+записи кэша перестают находиться (их вытеснит LRU или истечет TTL).
+Внутри процесса ответы хранятся в LRU, дополнительно можно подключить общий бэкенд
+(указывается путем импорта класса в OPERATIONS_CACHE_BACKEND)
+"""
+
+import hashlib
+import importlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from src.config import (
+    OPERATIONS_CACHE_BACKEND,
+    OPERATIONS_CACHE_INVALIDATION,
+    OPERATIONS_CACHE_MAX_SIZE,
+    OPERATIONS_CACHE_TTL,
+)
+from src.notifications import notification_listener, publish
+
+# Канал, через который воркеры сообщают друг другу о записи операций
+OPERATIONS_INVALIDATION_CHANNEL = "operations_cache_invalidate"
+
+
+class LocalCacheBackend:
+    """
+    Бэкенд в памяти процесса. Повторяет интерфейс общего хранилища
+    (get/set/incr/get_counter) и подходит как заглушка для разработки и тестов.
+    Общий бэкенд, например на Redis, реализует те же асинхронные методы
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, bytes]] = {}
+        self._counters: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._values[key] = (time.monotonic() + ttl, value)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+
+def load_backend(path: str):
+    """
+    Создает бэкенд по пути импорта вида 'package.module.ClassName'
+    """
+    module_name, _, class_name = path.rpartition(".")
+    if not module_name:
+        raise ValueError(f"Некорректный путь к бэкенду кэша: {path}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        # ETag считается один раз при сохранении, проверка If-None-Match не трогает тело
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class ResponseCache:
+    def __init__(self, ttl: float, max_size: int, backend=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def generation(self, operation_type: str) -> int:
+        if self.backend is not None:
+            return await self.backend.get_counter(self._generation_key(operation_type))
+        return self._generations.get(operation_type, 0)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+            del self._entries[key]
+
+        if self.backend is not None:
+            body = await self.backend.get(key)
+            if body is not None:
+                response = CachedResponse(body)
+                self._store_local(key, response)
+                self.backend_hits += 1
+                return response
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, body: bytes) -> CachedResponse:
+        response = CachedResponse(body)
+        self._store_local(key, response)
+        if self.backend is not None:
+            await self.backend.set(key, body, self.ttl)
+        return response
+
+    async def invalidate(self, operation_types: Iterable[str]):
+        """
+        Увеличивает поколение типов операций после записи (вызывается после commit)
+        """
+        for operation_type in set(operation_types):
+            self.bump_local(operation_type)
+            if self.backend is not None:
+                await self.backend.incr(self._generation_key(operation_type))
+            if OPERATIONS_CACHE_INVALIDATION == "postgres":
+                await publish(OPERATIONS_INVALIDATION_CHANNEL, operation_type)
+
+    def bump_local(self, operation_type: str):
+        self._generations[operation_type] = self._generations.get(operation_type, 0) + 1
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._generations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.backend_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "invalidation": OPERATIONS_CACHE_INVALIDATION,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.backend_hits) / requests, 4) if requests else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _store_local(self, key: str, response: CachedResponse):
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _generation_key(operation_type: str) -> str:
+        return f"operations:generation:{operation_type}"
+
+
+def cache_key(
+    operation_type: str,
+    generation: int,
+    limit: int,
+    after: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    content_type: str = "application/json",
+) -> str:
+    """
+    Ключ кэша из нормализованных параметров: порядок и запись параметров
+    в строке запроса на него не влияют
+    """
+    return "|".join((
+        "operations",
+        content_type,
+        operation_type,
+        str(generation),
+        str(limit),
+        after or "",
+        date_from.isoformat() if date_from is not None else "",
+        date_to.isoformat() if date_to is not None else "",
+    ))
+
+
+response_cache = ResponseCache(
+    ttl=OPERATIONS_CACHE_TTL,
+    max_size=OPERATIONS_CACHE_MAX_SIZE,
+    backend=load_backend(OPERATIONS_CACHE_BACKEND) if OPERATIONS_CACHE_BACKEND else None,
+)
+
+
+def _on_operations_written(payload: str):
+    response_cache.bump_local(payload)
+
+
+if OPERATIONS_CACHE_INVALIDATION == "postgres":
+    notification_listener.add_handler(OPERATIONS_INVALIDATION_CHANNEL, _on_operations_written)
+    notification_listener.on_reconnect(response_cache.clear)
@@ -0,0 +1,175 @@
+"""
+Выгрузка операций целиком для аналитики: CSV, Arrow IPC (поток) или Parquet.
+Строки читаются курсором asyncpg пачками и раскладываются по столбцам без создания
+объектов на строку, поэтому память ограничена размером одной пачки.
+Arrow и Parquet доступны, если установлен pyarrow
+"""
+
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Tuple
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_COLUMNS = ("id", "quantity", "figi", "instrument_type", "date", "type")
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    arrow = "arrow"
+    parquet = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+}
+
+FILE_EXTENSIONS = {
+    ExportFormat.csv: "csv",
+    ExportFormat.arrow: "arrows",
+    ExportFormat.parquet: "parquet",
+}
+
+
+def format_available(export_format: ExportFormat) -> bool:
+    return export_format == ExportFormat.csv or pyarrow is not None
+
+
+def export_query(
+    operation_type: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime]
+) -> Tuple[str, List]:
+    """
+    SQL выгрузки с позиционными параметрами asyncpg. quantity выгружается текстом,
+    чтобы не терять точность numeric без заданного масштаба
+    """
+    conditions = []
+    args = []
+    for condition, value in (
+        ("type = ${}", operation_type),
+        ("date >= ${}", date_from),
+        ("date < ${}", date_to),
+    ):
+        if value is not None:
+            args.append(value)
+            conditions.append(condition.format(len(args)))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT id, quantity::text, figi, instrument_type, date, type
+        FROM operation {where}
+        ORDER BY date, id
+    """
+    return sql, args
+
+
+async def iter_record_chunks(driver_connection, sql: str, args: List, chunk_size: int):
+    """
+    Пачки записей asyncpg из серверного курсора (нужна открытая транзакция)
+    """
+    cursor = await driver_connection.cursor(sql, *args)
+    while True:
+        records = await cursor.fetch(chunk_size)
+        if not records:
+            return
+        yield records
+
+
+class _ChunkSink:
+    """
+    Файлоподобный приемник для писателей pyarrow: накапливает байты,
+    которые забираются после каждой пачки
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema():
+    return pyarrow.schema([
+        ("id", pyarrow.int64()),
+        ("quantity", pyarrow.string()),
+        ("figi", pyarrow.string()),
+        ("instrument_type", pyarrow.string()),
+        ("date", pyarrow.timestamp("us")),
+        ("type", pyarrow.string()),
+    ])
+
+
+def _record_batch(schema, records):
+    # zip(*records) раскладывает пачку по столбцам на стороне C
+    columns = zip(*records)
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+async def encode_csv(chunks) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for records in chunks:
+        writer.writerows(records)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def encode_arrow(chunks) -> AsyncIterator[bytes]:
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        async for records in chunks:
+            writer.write_batch(_record_batch(schema, records))
+            yield sink.take()
+    yield sink.take()
+
+
+async def encode_parquet(chunks) -> AsyncIterator[bytes]:
+    # Каждая пачка становится отдельной группой строк Parquet
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+        async for records in chunks:
+            writer.write_batch(_record_batch(schema, records))
+            yield sink.take()
+    yield sink.take()
+
+
+ENCODERS = {
+    ExportFormat.csv: encode_csv,
+    ExportFormat.arrow: encode_arrow,
+    ExportFormat.parquet: encode_parquet,
+}
@@ -0,0 +1,232 @@
+"""
+Лента новых операций для подписчиков по WebSocket и SSE.
+FeedHub раздает события подпискам внутри процесса: у каждой подписки своя
+ограниченная очередь, и медленный клиент не задерживает остальных - при переполнении
+его старые события отбрасываются (drop) или подписка закрывается (disconnect).
+Источник событий - запись через API в этом процессе (local) или Postgres NOTIFY,
+отправленный в транзакции записи (postgres), тогда события получают все воркеры.
+Событие операции содержит ее id; вместо событий сверх OPERATIONS_FEED_MAX_BULK_ROWS
+одной записи подписчики получают событие {"event": "gap"} и должны перечитать операции
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import text
+
+from src.config import (
+    OPERATIONS_FEED_MAX_BULK_ROWS,
+    OPERATIONS_FEED_QUEUE_SIZE,
+    OPERATIONS_FEED_SLOW_CONSUMER,
+    OPERATIONS_FEED_SOURCE,
+)
+from src.notifications import notification_listener
+from src.serialization import dumps
+
+FEED_CHANNEL = "operations_feed"
+# Предел полезной нагрузки NOTIFY - 8000 байт, оставляем запас
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+POLICY_DROP = "drop"
+POLICY_DISCONNECT = "disconnect"
+
+GAP_EVENT = {"event": "gap", "reason": "bulk_limit"}
+
+_CLOSED = None
+
+
+class FeedSubscription:
+    def __init__(self, operation_type: Optional[str], figi: Optional[str], queue_size: int):
+        self.operation_type = operation_type
+        self.figi = figi
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        # Служебные события (gap) получают все подписки
+        return self.figi is None or "event" in event or self.figi == event.get("figi")
+
+    async def get(self) -> Optional[bytes]:
+        """
+        Следующее событие в виде готового JSON или None, если подписка закрыта
+        """
+        return await self.queue.get()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Место под признак закрытия освобождается за счет недоставленных событий
+        while self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+
+class FeedHub:
+    def __init__(self, queue_size: int, slow_consumer_policy: str):
+        if slow_consumer_policy not in (POLICY_DROP, POLICY_DISCONNECT):
+            raise ValueError(f"Неизвестная политика для медленных подписчиков: {slow_consumer_policy}")
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        # Подписки по типу операции, None - на все типы
+        self._subscriptions: Dict[Optional[str], Set[FeedSubscription]] = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    @property
+    def has_subscribers(self) -> bool:
+        return any(self._subscriptions.values())
+
+    def subscribe(self, operation_type: Optional[str] = None, figi: Optional[str] = None) -> FeedSubscription:
+        subscription = FeedSubscription(operation_type, figi, self.queue_size)
+        self._subscriptions[operation_type].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: FeedSubscription):
+        subscriptions = self._subscriptions.get(subscription.operation_type)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.operation_type]
+        subscription.close()
+
+    def publish(self, events: Iterable[Dict[str, Any]]):
+        """
+        Раздает события подходящим подпискам, никогда не ожидая подписчиков
+        """
+        for event in events:
+            self.published += 1
+            if event.get("event") == GAP_EVENT["event"]:
+                # Пропуск мог затронуть любую подписку
+                targets = [subscription for subscriptions in self._subscriptions.values() for subscription in subscriptions]
+            else:
+                targets = list(self._subscriptions.get(event.get("type"), ())) + list(self._subscriptions.get(None, ()))
+            data = None
+            for subscription in targets:
+                if subscription.closed or not subscription.matches(event):
+                    continue
+                if data is None:
+                    # Событие кодируется один раз для всех подписчиков
+                    data = dumps(event)
+                self._deliver(subscription, data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": OPERATIONS_FEED_SOURCE,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "subscribers": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
+
+    def _deliver(self, subscription: FeedSubscription, data: bytes):
+        try:
+            subscription.queue.put_nowait(data)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.slow_consumer_policy == POLICY_DISCONNECT:
+            self.disconnected += 1
+            self.unsubscribe(subscription)
+            return
+        subscription.queue.get_nowait()
+        subscription.queue.put_nowait(data)
+        subscription.dropped += 1
+        self.dropped += 1
+
+
+operation_feed = FeedHub(queue_size=OPERATIONS_FEED_QUEUE_SIZE, slow_consumer_policy=OPERATIONS_FEED_SLOW_CONSUMER)
+
+
+def to_event(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": values.get("id"),
+        "quantity": str(values["quantity"]) if values.get("quantity") is not None else None,
+        "figi": values.get("figi"),
+        "instrument_type": values.get("instrument_type"),
+        "date": values["date"].isoformat() if values.get("date") is not None else None,
+        "type": values.get("type"),
+    }
+
+
+def _notify_payloads(events: List[Dict[str, Any]]) -> List[str]:
+    # События объединяются в JSON-массивы, не превышающие предел NOTIFY
+    payloads, current, size = [], [], 2
+    for event in events:
+        encoded = json.dumps(event, separators=(",", ":"))
+        if current and size + len(encoded) + 1 > NOTIFY_PAYLOAD_LIMIT:
+            payloads.append("[" + ",".join(current) + "]")
+            current, size = [], 2
+        current.append(encoded)
+        size += len(encoded) + 1
+    if current:
+        payloads.append("[" + ",".join(current) + "]")
+    return payloads
+
+
+class FeedBatch:
+    """
+    События ленты одной транзакции записи. Первые OPERATIONS_FEED_MAX_BULK_ROWS
+    операций становятся событиями, вместо остальных отправляется одно событие gap.
+    Источник postgres отправляет NOTIFY внутри транзакции: Postgres доставит
+    уведомления только после commit, а при откате не доставит вовсе. NOTIFY
+    отправляется и без подписчиков: слушают другие воркеры, и пишущий процесс не
+    может узнать, есть ли подписчики у них. Источник local копит строки до commit,
+    только если у процесса есть подписчики
+    """
+
+    def __init__(self):
+        self.postgres = OPERATIONS_FEED_SOURCE == "postgres"
+        self.enabled = self.postgres or (OPERATIONS_FEED_SOURCE == "local" and operation_feed.has_subscribers)
+        self.count = 0
+        self.overflow = False
+        self._events: List[Dict[str, Any]] = []
+
+    def accepts(self, count: int) -> bool:
+        """
+        Станут ли событиями следующие count операций, то есть нужны ли их id
+        """
+        return self.enabled and not self.overflow and self.count + count <= OPERATIONS_FEED_MAX_BULK_ROWS
+
+    async def add(self, session, rows: List[Dict[str, Any]], driver_connection=None):
+        """
+        Добавляет записанную пачку. Внутри bulk_transaction NOTIFY идет через
+        соединение asyncpg, как и COPY
+        """
+        if not rows or not self.enabled or self.overflow:
+            return
+        if self.accepts(len(rows)):
+            self.count += len(rows)
+            events = [to_event(row) for row in rows]
+        else:
+            self.overflow = True
+            events = [GAP_EVENT]
+        if not self.postgres:
+            self._events.extend(events)
+            return
+        for payload in _notify_payloads(events):
+            if driver_connection is not None:
+                await driver_connection.execute("SELECT pg_notify($1, $2)", FEED_CHANNEL, payload)
+            else:
+                await session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": FEED_CHANNEL, "payload": payload})
+
+    def publish_committed(self):
+        """
+        Для источника local: раздача подписчикам этого процесса после commit
+        """
+        if self._events:
+            operation_feed.publish(self._events)
+            self._events = []
+
+
+def _on_feed_notification(payload: str):
+    operation_feed.publish(json.loads(payload))
+
+
+if OPERATIONS_FEED_SOURCE == "postgres":
+    notification_listener.add_handler(FEED_CHANNEL, _on_feed_notification)
@@ -1,13 +1,55 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP
+from sqlalchemy import BigInteger, Column, Index, Integer, Numeric, String, TIMESTAMP
 
+from src.config import OPERATION_PARTITIONING
 from src.database import Base
 
 class Operation(Base):
     __tablename__ = "operation"
+    __table_args__ = (
+        # Индексы под основные пути доступа: выборка по типу с keyset-пагинацией
+        # по (date, id) и выборка по инструменту за период
+        Index("ix_operation_type_date", "type", "date", "id"),
+        Index("ix_operation_figi_date", "figi", "date"),
+        # Пересчет сводок за последние часы: BRIN мал и подходит для дат, растущих вместе с вставкой
+        Index("ix_operation_date_brin", "date", postgresql_using="brin"),
+        # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+        {"postgresql_partition_by": "RANGE (date)"} if OPERATION_PARTITIONING else {},
+    )
     
-    id = Column(Integer, primary_key=True)
-    quantity = Column(String)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    quantity = Column(Numeric)
     figi = Column(String)
     instrument_type = Column(String, nullable=True)
-    date = Column(TIMESTAMP)
+    date = Column(TIMESTAMP, primary_key=OPERATION_PARTITIONING)
     type = Column(String)
+
+
+class OperationDailyFigi(Base):
+    """
+    Сводка операций по инструменту за день, поддерживается src/operations/rollups.py
+    """
+    __tablename__ = "operation_daily_figi"
+
+    figi = Column(String, primary_key=True)
+    day = Column(TIMESTAMP, primary_key=True)
+    operations = Column(BigInteger, nullable=False, default=0)
+    volume = Column(Numeric, nullable=False, default=0)
+    min_quantity = Column(Numeric)
+    max_quantity = Column(Numeric)
+    # Чистая позиция за день: покупки минус продажи, и число таких операций
+    position = Column(Numeric, nullable=False, default=0)
+    position_operations = Column(BigInteger, nullable=False, default=0)
+
+
+class OperationHourlyType(Base):
+    """
+    Сводка операций по типу за час, поддерживается src/operations/rollups.py
+    """
+    __tablename__ = "operation_hourly_type"
+
+    type = Column(String, primary_key=True)
+    hour = Column(TIMESTAMP, primary_key=True)
+    operations = Column(BigInteger, nullable=False, default=0)
+    volume = Column(Numeric, nullable=False, default=0)
+    min_quantity = Column(Numeric)
+    max_quantity = Column(Numeric)
@@ -0,0 +1,33 @@
+"""
+Курсорная (keyset) пагинация операций по паре (date, id).
+Операции без даты идут после всех остальных в порядке id, в курсоре у них пустая дата
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(date: Optional[datetime], operation_id: int) -> str:
+    """
+    Кодирует позицию последней отданной записи в непрозрачный курсор
+    """
+    raw = f"{date.isoformat() if date is not None else ''}|{operation_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Optional[datetime], int]]:
+    """
+    Разбирает курсор, полученный от клиента в параметре after
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_part, id_part = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return (datetime.fromisoformat(date_part) if date_part else None), int(id_part)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
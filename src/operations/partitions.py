@@ -0,0 +1,283 @@
+"""
+Помесячное секционирование таблицы operation по полю date (RANGE-партиции Postgres)
+и обслуживание партиций: заблаговременное создание будущих и отсоединение старых.
+Существующая таблица переводится в секционированную явной командой PARTITION_COMMAND
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from src.config import (
+    OPERATION_PARTITIONS_AHEAD,
+    OPERATION_PARTITIONS_ARCHIVE_SCHEMA,
+    OPERATION_PARTITIONS_RETENTION_MONTHS,
+)
+from src.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "operation"
+DEFAULT_PARTITION = "operation_default"
+PARTITION_NAME_RE = re.compile(r"^operation_y(\d{4})m(\d{2})$")
+IS_PARTITIONED_SQL = "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('operation')"
+PARTITION_COMMAND = "python partition_operation.py"
+# Ключ advisory lock: обслуживание партиций выполняет только один воркер за раз
+PARTITIONS_LOCK_KEY = 7263544512
+OPERATION_COLUMNS = "id, quantity, figi, instrument_type, date, type"
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"operation_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partition_table(name: str) -> bool:
+    """
+    Относится ли таблица к партициям operation (используется в env.py Alembic)
+    """
+    return name == DEFAULT_PARTITION or PARTITION_NAME_RE.match(name) is not None
+
+
+def create_partition_sql(month: datetime) -> str:
+    start = month_start(month)
+    end = add_months(start, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def create_default_partition_sql() -> str:
+    return f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"
+
+
+def partition_statements(first_month: datetime, last_month: datetime) -> List[str]:
+    """
+    DDL партиций для месяцев от first_month до last_month включительно и партиции по умолчанию
+    """
+    statements = []
+    month = month_start(first_month)
+    while month <= month_start(last_month):
+        statements.append(create_partition_sql(month))
+        month = add_months(month, 1)
+    statements.append(create_default_partition_sql())
+    return statements
+
+
+def _recreate_indexes(connection) -> None:
+    connection.execute(text("CREATE INDEX ix_operation_type_date ON operation (type, date, id)"))
+    connection.execute(text("CREATE INDEX ix_operation_figi_date ON operation (figi, date)"))
+    connection.execute(text("CREATE INDEX ix_operation_date_brin ON operation USING brin (date)"))
+
+
+def _detach_old_table(connection) -> None:
+    # Индексы и первичный ключ старой таблицы освобождают имена для новой
+    connection.execute(text("DROP INDEX IF EXISTS ix_operation_type_date"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_operation_figi_date"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_operation_date_brin"))
+    connection.execute(text("ALTER TABLE operation RENAME TO operation_old"))
+    connection.execute(text("ALTER TABLE operation_old RENAME CONSTRAINT operation_pkey TO operation_old_pkey"))
+
+
+def _move_rows_and_sequence(connection) -> None:
+    connection.execute(text(f"INSERT INTO operation ({OPERATION_COLUMNS}) SELECT {OPERATION_COLUMNS} FROM operation_old"))
+    connection.execute(text("ALTER SEQUENCE operation_id_seq OWNED BY operation.id"))
+    connection.execute(text("DROP TABLE operation_old"))
+
+
+def convert_to_partitioned(connection, months_ahead: int = OPERATION_PARTITIONS_AHEAD) -> bool:
+    """
+    Переводит обычную таблицу operation в секционированную с переносом данных.
+    Принимает синхронное соединение (для AsyncConnection - через run_sync).
+    Возвращает False, если таблица уже секционирована
+    """
+    if connection.execute(text(IS_PARTITIONED_SQL)).scalar():
+        return False
+
+    without_date = connection.execute(text("SELECT count(*) FROM operation WHERE date IS NULL")).scalar()
+    if without_date:
+        raise RuntimeError(
+            f"В таблице operation {without_date} строк без даты, их нельзя разместить в партициях. "
+            f"Заполните date перед секционированием"
+        )
+
+    _detach_old_table(connection)
+    connection.execute(text(
+        "CREATE TABLE operation (LIKE operation_old INCLUDING DEFAULTS) PARTITION BY RANGE (date)"
+    ))
+    connection.execute(text("ALTER TABLE operation ALTER COLUMN date SET NOT NULL"))
+    connection.execute(text("ALTER TABLE operation ADD CONSTRAINT operation_pkey PRIMARY KEY (id, date)"))
+    _recreate_indexes(connection)
+
+    # Партиции покрывают весь период имеющихся данных и months_ahead месяцев вперед
+    oldest = connection.execute(text("SELECT min(date) FROM operation_old")).scalar()
+    now = datetime.utcnow()
+    for statement in partition_statements(min(oldest or now, now), add_months(now, months_ahead)):
+        connection.execute(text(statement))
+
+    _move_rows_and_sequence(connection)
+    return True
+
+
+def convert_to_plain(connection) -> bool:
+    """
+    Обратный перевод operation в обычную таблицу. Возвращает False, если она не секционирована
+    """
+    if not connection.execute(text(IS_PARTITIONED_SQL)).scalar():
+        return False
+
+    _detach_old_table(connection)
+    connection.execute(text("CREATE TABLE operation (LIKE operation_old INCLUDING DEFAULTS)"))
+    connection.execute(text("ALTER TABLE operation ALTER COLUMN date DROP NOT NULL"))
+    connection.execute(text("ALTER TABLE operation ADD CONSTRAINT operation_pkey PRIMARY KEY (id)"))
+    _recreate_indexes(connection)
+    _move_rows_and_sequence(connection)
+    return True
+
+
+async def is_partitioned(conn) -> bool:
+    return bool(await conn.scalar(text(IS_PARTITIONED_SQL)))
+
+
+async def ensure_partitions(conn, months_ahead: int = OPERATION_PARTITIONS_AHEAD, now: Optional[datetime] = None) -> List[str]:
+    """
+    Создает партиции с текущего месяца на months_ahead месяцев вперед
+    и партицию по умолчанию для дат вне созданных диапазонов
+    """
+    current = month_start(now or datetime.utcnow())
+    existing = set(await _list_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name not in existing:
+            await _create_partition(conn, month, DEFAULT_PARTITION in existing)
+            created.append(name)
+    if DEFAULT_PARTITION not in existing:
+        await conn.execute(text(create_default_partition_sql()))
+        created.append(DEFAULT_PARTITION)
+    return created
+
+
+async def _create_partition(conn, month: datetime, has_default: bool):
+    """
+    Создает партицию месяца. Postgres не создаст ее, пока строки этого месяца лежат
+    в партиции по умолчанию, поэтому такие строки переносятся в новую партицию:
+    партиция по умолчанию на это время отсоединяется (в текущей транзакции)
+    """
+    bounds = {"start": month_start(month), "end": add_months(month_start(month), 1)}
+    if not has_default or not await conn.scalar(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end)"), bounds
+    ):
+        await conn.execute(text(create_partition_sql(month)))
+        return
+
+    await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    await conn.execute(text(create_partition_sql(month)))
+    moved = await conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end "
+            f"RETURNING {OPERATION_COLUMNS}) "
+            f"INSERT INTO {PARENT_TABLE} ({OPERATION_COLUMNS}) SELECT {OPERATION_COLUMNS} FROM moved"
+        ),
+        bounds,
+    )
+    await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.info(f"Из {DEFAULT_PARTITION} в {partition_name(month)} перенесено строк: {moved.rowcount}")
+
+
+async def detach_old_partitions(
+    conn,
+    retention_months: int = OPERATION_PARTITIONS_RETENTION_MONTHS,
+    archive_schema: str = OPERATION_PARTITIONS_ARCHIVE_SCHEMA,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Отсоединяет партиции старше retention_months месяцев и, если задана схема архива,
+    переносит их туда. При retention_months = 0 старые партиции не трогаются
+    """
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    detached = []
+    for name in await _list_partitions(conn):
+        match = PARTITION_NAME_RE.match(name)
+        if match is None:
+            continue
+        if datetime(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+            continue
+        await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if archive_schema:
+            await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"'))
+            archived = await conn.scalar(
+                text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{archive_schema}".{name}'}
+            )
+            if archived:
+                # В архиве уже есть таблица с таким именем (например, партиция была создана заново),
+                # отсоединенная переносится под именем с отметкой времени
+                renamed = f"{name}_{(now or datetime.utcnow()):%Y%m%d%H%M%S}"
+                await conn.execute(text(f"ALTER TABLE {name} RENAME TO {renamed}"))
+                name = renamed
+            await conn.execute(text(f'ALTER TABLE {name} SET SCHEMA "{archive_schema}"'))
+        detached.append(name)
+    return detached
+
+
+async def _list_partitions(conn) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.oid = to_regclass(:name)"
+        ),
+        {"name": PARENT_TABLE},
+    )
+    return [row[0] for row in result]
+
+
+async def maintain_partitions():
+    """
+    Один проход обслуживания партиций. Если его уже выполняет другой воркер, проход пропускается
+    """
+    async with engine.begin() as conn:
+        if not await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": PARTITIONS_LOCK_KEY}):
+            return
+        if not await is_partitioned(conn):
+            logger.warning(
+                "Секционирование operation включено, но таблица не секционирована. "
+                f"Выполните '{PARTITION_COMMAND}'"
+            )
+            return
+        created = await ensure_partitions(conn)
+        detached = await detach_old_partitions(conn)
+    if created:
+        logger.info(f"Созданы партиции operation: {', '.join(created)}")
+    if detached:
+        logger.info(f"Отсоединены старые партиции operation: {', '.join(detached)}")
+
+
+async def run_partition_maintenance(interval: float):
+    """
+    Фоновая задача, периодически обслуживающая партиции (запускается из lifespan)
+    """
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as e:
+            logger.error(f"Ошибка при обслуживании партиций operation: {e}")
+        await asyncio.sleep(interval)
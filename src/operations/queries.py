@@ -0,0 +1,121 @@
+"""
+Заранее построенные запросы для горячих путей operations.
+Запрос собирается один раз для каждого набора фильтров, а значения передаются
+через bindparam, поэтому на запрос не тратится время на построение выражения,
+а скомпилированный SQL берется из кэша SQLAlchemy
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Integer, Text, bindparam, cast, false, insert, select, tuple_, union_all
+
+from src.config import OPERATIONS_STREAM_CHUNK_SIZE
+from src.operations.models import Operation
+from src.operations.pagination import decode_cursor
+
+# quantity отдается текстом: так его не нужно превращать из Decimal в строку в Python,
+# и ответ сериализуется без обхода полей
+OPERATION_COLUMNS = (
+    Operation.id,
+    cast(Operation.quantity, Text).label("quantity"),
+    Operation.figi,
+    Operation.instrument_type,
+    Operation.date,
+    Operation.type,
+)
+
+INSERT_OPERATION = insert(Operation).returning(Operation.id)
+
+
+def _operations_select():
+    return select(*OPERATION_COLUMNS).where(Operation.type == bindparam("operation_type"))
+
+
+def _limited(query, stream: bool):
+    if stream:
+        return query
+    return query.limit(bindparam("limit", type_=Integer))
+
+
+@lru_cache(maxsize=None)
+def operations_statement(
+    has_after: bool, has_date_from: bool, has_date_to: bool, stream: bool = False, after_undated: bool = False
+):
+    """
+    Запрос операций заданного типа в порядке (date, id) для одного набора фильтров.
+    Ограничение по дате позволяет Postgres отсечь лишние партиции.
+    Операции без даты идут последними (NULLS LAST, как и в индексе по (type, date, id)).
+    После курсора на операции с датой запрос складывается из двух веток, каждая из
+    которых читает индекс с позиции курсора: оставшиеся операции с датой и все без даты
+    """
+    if after_undated:
+        # Курсор уже среди операций без даты: с фильтром по дате таких нет
+        query = (
+            _operations_select()
+            .where(Operation.date.is_(None), Operation.id > bindparam("after_id", type_=Operation.id.type))
+            .order_by(Operation.id)
+        )
+        if has_date_from or has_date_to:
+            query = query.where(false())
+        query = _limited(query, stream)
+    else:
+        dated = _operations_select()
+        if has_date_from:
+            dated = dated.where(Operation.date >= bindparam("date_from"))
+        if has_date_to:
+            dated = dated.where(Operation.date < bindparam("date_to"))
+        if has_after:
+            dated = dated.where(
+                tuple_(Operation.date, Operation.id)
+                > tuple_(
+                    bindparam("after_date", type_=Operation.date.type),
+                    bindparam("after_id", type_=Operation.id.type),
+                )
+            )
+        if not has_after or has_date_from or has_date_to:
+            # Без курсора операции без даты и так попадают в конец по порядку индекса,
+            # а с фильтром по дате их нет
+            query = _limited(dated.order_by(Operation.date, Operation.id), stream)
+        else:
+            undated = _operations_select().where(Operation.date.is_(None)).order_by(Operation.id)
+            dated = _limited(dated.order_by(Operation.date, Operation.id), stream)
+            union = union_all(dated, _limited(undated, stream)).subquery()
+            query = _limited(
+                select(*union.c).order_by(union.c.date.asc().nulls_last(), union.c.id), stream
+            )
+    if stream:
+        return query.execution_options(yield_per=OPERATIONS_STREAM_CHUNK_SIZE)
+    return query
+
+
+def build_operations_query(
+    operation_type: str,
+    after: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Возвращает закэшированный запрос и параметры для него.
+    Без limit запрос рассчитан на потоковое чтение
+    """
+    position = decode_cursor(after)
+    after_undated = position is not None and position[0] is None
+    statement = operations_statement(
+        position is not None, date_from is not None, date_to is not None,
+        stream=limit is None, after_undated=after_undated,
+    )
+    params = {"operation_type": operation_type}
+    if position is not None:
+        params["after_id"] = position[1]
+        if not after_undated:
+            params["after_date"] = position[0]
+    if date_from is not None:
+        params["date_from"] = date_from
+    if date_to is not None:
+        params["date_to"] = date_to
+    if limit is not None:
+        params["limit"] = limit
+    return statement, params
@@ -0,0 +1,236 @@
+"""
+Сводные таблицы по операциям: operation_daily_figi (инструмент/день) и
+operation_hourly_type (тип/час). При записи через API сводки обновляются
+приращениями в той же транзакции, фоновая задача периодически пересчитывает
+последние часы по таблице operation, а проверка сравнивает сводки с исходными данными
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import OPERATIONS_BUY_TYPES, OPERATIONS_SELL_TYPES
+from src.database import engine
+from src.operations.models import OperationDailyFigi, OperationHourlyType
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLES = (OperationDailyFigi.__tablename__, OperationHourlyType.__tablename__)
+
+
+def _upsert(model, keys, additive, extremes=("min_quantity", "max_quantity")):
+    statement = insert(model)
+    table = model.__table__
+    set_ = {column: table.c[column] + statement.excluded[column] for column in additive}
+    set_[extremes[0]] = func.least(table.c[extremes[0]], statement.excluded[extremes[0]])
+    set_[extremes[1]] = func.greatest(table.c[extremes[1]], statement.excluded[extremes[1]])
+    return statement.on_conflict_do_update(index_elements=keys, set_=set_)
+
+
+UPSERT_DAILY_FIGI = _upsert(
+    OperationDailyFigi,
+    ["figi", "day"],
+    ("operations", "volume", "position", "position_operations"),
+)
+UPSERT_HOURLY_TYPE = _upsert(OperationHourlyType, ["type", "hour"], ("operations", "volume"))
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # Столбец date хранится без часового пояса, так же приводит значения и драйвер
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _add(entry: Dict[str, Any], quantity):
+    entry["operations"] += 1
+    if quantity is None:
+        return
+    entry["volume"] += quantity
+    if entry["min_quantity"] is None or quantity < entry["min_quantity"]:
+        entry["min_quantity"] = quantity
+    if entry["max_quantity"] is None or quantity > entry["max_quantity"]:
+        entry["max_quantity"] = quantity
+
+
+def _new_entry(**keys) -> Dict[str, Any]:
+    return {**keys, "operations": 0, "volume": 0, "min_quantity": None, "max_quantity": None}
+
+
+def rollup_deltas(rows: Iterable[Dict[str, Any]]):
+    """
+    Приращения сводок для пачки новых операций. Ключи отсортированы, чтобы
+    параллельные пачки блокировали строки сводок в одном порядке
+    """
+    daily: Dict[tuple, Dict[str, Any]] = {}
+    hourly: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        figi, operation_type, quantity = row.get("figi"), row.get("type"), row.get("quantity")
+        date = _naive_utc(row["date"])
+
+        if figi is not None:
+            day = date.replace(hour=0, minute=0, second=0, microsecond=0)
+            entry = daily.get((figi, day))
+            if entry is None:
+                entry = daily[(figi, day)] = _new_entry(figi=figi, day=day, position=0, position_operations=0)
+            _add(entry, quantity)
+            if operation_type in OPERATIONS_BUY_TYPES or operation_type in OPERATIONS_SELL_TYPES:
+                entry["position_operations"] += 1
+                if quantity is not None:
+                    entry["position"] += -quantity if operation_type in OPERATIONS_SELL_TYPES else quantity
+
+        if operation_type is not None:
+            hour = date.replace(minute=0, second=0, microsecond=0)
+            entry = hourly.get((operation_type, hour))
+            if entry is None:
+                entry = hourly[(operation_type, hour)] = _new_entry(type=operation_type, hour=hour)
+            _add(entry, quantity)
+
+    return [daily[key] for key in sorted(daily)], [hourly[key] for key in sorted(hourly)]
+
+
+async def apply_rollups(connection, rows: List[Dict[str, Any]]):
+    """
+    Обновляет сводки для только что записанных операций в текущей транзакции.
+    Принимает AsyncSession или AsyncConnection
+    """
+    daily, hourly = rollup_deltas(rows)
+    # Порядок таблиц тот же, что и в LOCK TABLE при пересчете, иначе возможна взаимоблокировка
+    if daily:
+        await connection.execute(UPSERT_DAILY_FIGI, daily)
+    if hourly:
+        await connection.execute(UPSERT_HOURLY_TYPE, hourly)
+
+
+REFRESH_DAILY_FIGI_SQL = """
+INSERT INTO operation_daily_figi
+    (figi, day, operations, volume, min_quantity, max_quantity, position, position_operations)
+SELECT figi, date_trunc('day', date), count(*), coalesce(sum(quantity), 0), min(quantity), max(quantity),
+       coalesce(sum(CASE WHEN type = ANY(:sell_types) THEN -quantity
+                         WHEN type = ANY(:buy_types) THEN quantity END), 0),
+       count(*) FILTER (WHERE type = ANY(:sell_types) OR type = ANY(:buy_types))
+FROM operation
+WHERE figi IS NOT NULL AND date IS NOT NULL AND (CAST(:since AS timestamp) IS NULL OR date >= :since)
+GROUP BY 1, 2
+"""
+
+REFRESH_HOURLY_TYPE_SQL = """
+INSERT INTO operation_hourly_type (type, hour, operations, volume, min_quantity, max_quantity)
+SELECT type, date_trunc('hour', date), count(*), coalesce(sum(quantity), 0), min(quantity), max(quantity)
+FROM operation
+WHERE type IS NOT NULL AND date IS NOT NULL AND (CAST(:since AS timestamp) IS NULL OR date >= :since)
+GROUP BY 1, 2
+"""
+
+
+def _window_start(since: Optional[datetime]):
+    # Сводка по дням пересчитывается целыми днями, по часам - целыми часами
+    if since is None:
+        return None, None
+    since = _naive_utc(since)
+    return since.replace(hour=0, minute=0, second=0, microsecond=0), since.replace(minute=0, second=0, microsecond=0)
+
+
+async def refresh_rollups(conn, since: Optional[datetime] = None):
+    """
+    Пересчитывает сводки по таблице operation начиная с since (без since - полностью).
+    Блокировка сводок дожидается транзакций, которые уже обновили их приращениями,
+    и задерживает новые до конца пересчета, поэтому ни одна запись не учитывается дважды.
+    Запись через API на это время ждет, поэтому окно читается по BRIN-индексу на date,
+    а не полным просмотром operation. Операции без даты в сводки не входят
+    """
+    daily_since, hourly_since = _window_start(since)
+    await conn.execute(text(f"LOCK TABLE {', '.join(ROLLUP_TABLES)} IN SHARE ROW EXCLUSIVE MODE"))
+
+    if daily_since is None:
+        await conn.execute(text("DELETE FROM operation_daily_figi"))
+        await conn.execute(text("DELETE FROM operation_hourly_type"))
+    else:
+        await conn.execute(text("DELETE FROM operation_daily_figi WHERE day >= :since"), {"since": daily_since})
+        await conn.execute(text("DELETE FROM operation_hourly_type WHERE hour >= :since"), {"since": hourly_since})
+
+    types = {"buy_types": OPERATIONS_BUY_TYPES, "sell_types": OPERATIONS_SELL_TYPES}
+    await conn.execute(text(REFRESH_DAILY_FIGI_SQL), {"since": daily_since, **types})
+    await conn.execute(text(REFRESH_HOURLY_TYPE_SQL), {"since": hourly_since})
+
+
+CHECK_DAILY_FIGI_SQL = """
+WITH base AS (
+    SELECT figi, date_trunc('day', date) AS day, count(*) AS operations, coalesce(sum(quantity), 0) AS volume,
+           min(quantity) AS min_quantity, max(quantity) AS max_quantity,
+           coalesce(sum(CASE WHEN type = ANY(:sell_types) THEN -quantity
+                             WHEN type = ANY(:buy_types) THEN quantity END), 0) AS position,
+           count(*) FILTER (WHERE type = ANY(:sell_types) OR type = ANY(:buy_types)) AS position_operations
+    FROM operation
+    WHERE figi IS NOT NULL AND date IS NOT NULL AND (CAST(:since AS timestamp) IS NULL OR date >= :since)
+    GROUP BY 1, 2
+),
+rollup AS (
+    SELECT * FROM operation_daily_figi WHERE CAST(:since AS timestamp) IS NULL OR day >= :since
+)
+SELECT coalesce(base.figi, rollup.figi) AS figi, coalesce(base.day, rollup.day) AS day,
+       base.operations AS base_operations, rollup.operations AS rollup_operations,
+       base.volume AS base_volume, rollup.volume AS rollup_volume,
+       base.position AS base_position, rollup.position AS rollup_position
+FROM base FULL JOIN rollup ON rollup.figi = base.figi AND rollup.day = base.day
+WHERE (base.operations, base.volume, base.min_quantity, base.max_quantity, base.position, base.position_operations)
+    IS DISTINCT FROM
+    (rollup.operations, rollup.volume, rollup.min_quantity, rollup.max_quantity, rollup.position, rollup.position_operations)
+ORDER BY 2, 1
+"""
+
+CHECK_HOURLY_TYPE_SQL = """
+WITH base AS (
+    SELECT type, date_trunc('hour', date) AS hour, count(*) AS operations, coalesce(sum(quantity), 0) AS volume,
+           min(quantity) AS min_quantity, max(quantity) AS max_quantity
+    FROM operation
+    WHERE type IS NOT NULL AND date IS NOT NULL AND (CAST(:since AS timestamp) IS NULL OR date >= :since)
+    GROUP BY 1, 2
+),
+rollup AS (
+    SELECT * FROM operation_hourly_type WHERE CAST(:since AS timestamp) IS NULL OR hour >= :since
+)
+SELECT coalesce(base.type, rollup.type) AS type, coalesce(base.hour, rollup.hour) AS hour,
+       base.operations AS base_operations, rollup.operations AS rollup_operations,
+       base.volume AS base_volume, rollup.volume AS rollup_volume
+FROM base FULL JOIN rollup ON rollup.type = base.type AND rollup.hour = base.hour
+WHERE (base.operations, base.volume, base.min_quantity, base.max_quantity)
+    IS DISTINCT FROM (rollup.operations, rollup.volume, rollup.min_quantity, rollup.max_quantity)
+ORDER BY 2, 1
+"""
+
+
+async def check_rollups(conn, since: Optional[datetime] = None, sample_size: int = 10) -> Dict[str, Any]:
+    """
+    Сравнивает сводки с агрегатами по таблице operation и возвращает
+    количество расхождений и несколько примеров по каждой сводке
+    """
+    daily_since, hourly_since = _window_start(since)
+    types = {"buy_types": OPERATIONS_BUY_TYPES, "sell_types": OPERATIONS_SELL_TYPES}
+    report = {}
+    for name, sql, params in (
+        (OperationDailyFigi.__tablename__, CHECK_DAILY_FIGI_SQL, {"since": daily_since, **types}),
+        (OperationHourlyType.__tablename__, CHECK_HOURLY_TYPE_SQL, {"since": hourly_since}),
+    ):
+        rows = (await conn.execute(text(sql), params)).mappings().all()
+        report[name] = {"mismatches": len(rows), "samples": [dict(row) for row in rows[:sample_size]]}
+    report["consistent"] = all(report[name]["mismatches"] == 0 for name in ROLLUP_TABLES)
+    return report
+
+
+async def run_rollup_refresh(interval: float, window_hours: int):
+    """
+    Фоновая задача, досчитывающая сводки за последние window_hours часов
+    (запускается из lifespan). Нужна для строк, записанных в operation в обход API
+    """
+    while True:
+        try:
+            async with engine.begin() as conn:
+                await refresh_rollups(conn, datetime.utcnow() - timedelta(hours=window_hours))
+        except Exception as e:
+            logger.error(f"Ошибка при пересчете сводок по операциям: {e}")
+        await asyncio.sleep(interval)
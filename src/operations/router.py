@@ -1,27 +1,402 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, insert
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
-from src.operations.models import Operation
-from src.operations.schemas import OperationCreate
+from src.auth.base_config import require_permission
+from src.config import (
+    OPERATION_ROLLUPS,
+    OPERATIONS_AGGREGATE_MAX_AGE,
+    OPERATIONS_BULK_CHUNK_SIZE,
+    OPERATIONS_BULK_MAX_ERRORS,
+    OPERATIONS_CACHE_ENABLED,
+    OPERATIONS_CACHE_TTL,
+    OPERATIONS_EXPORT_CHUNK_SIZE,
+    OPERATIONS_FEED_HEARTBEAT,
+    OPERATIONS_MAX_PAGE_SIZE,
+    OPERATIONS_PAGE_SIZE,
+    OPERATIONS_REQUIRE_PERMISSIONS,
+)
+from src.database import (
+    LAST_WRITE_LSN_COOKIE,
+    choose_read_session_maker,
+    get_async_read_session,
+    get_async_session,
+    remember_write_lsn,
+)
+from src.operations.aggregates import (
+    AggregateGroup,
+    TimeBucket,
+    build_buckets_query,
+    build_positions_query,
+    build_volumes_query,
+)
+from src.operations.batching import ACK_ON_ENQUEUE, operation_write_queue
+from src.operations.bulk import (
+    bulk_transaction,
+    driver_transaction,
+    iter_bulk_payload,
+    validate_operation,
+    write_operations,
+)
+from src.operations.cache import cache_key, response_cache
+from src.operations.export import (
+    ENCODERS,
+    FILE_EXTENSIONS,
+    MEDIA_TYPES,
+    ExportFormat,
+    export_query,
+    format_available,
+    iter_record_chunks,
+)
+from src.operations.feed import FeedBatch, operation_feed
+from src.operations.pagination import encode_cursor
+from src.operations.queries import INSERT_OPERATION, build_operations_query
+from src.operations.rollups import apply_rollups
+from src.operations.schemas import BucketRow, OperationCreate, OperationPage, PositionRow, VolumeRow
+from src.serialization import (
+    MSGPACK_MEDIA_TYPE,
+    MsgPackRoute,
+    dumps,
+    negotiated_response,
+    packb,
+    wants_msgpack,
+)
+
+# Запись операций требует права write, если проверка прав включена
+WRITE_DEPENDENCIES = [Depends(require_permission("write"))] if OPERATIONS_REQUIRE_PERMISSIONS else []
 
 router = APIRouter(
     prefix="/operations",
-    tags=["Operation"]
+    tags=["Operation"],
+    # Тело POST-запросов принимается и в JSON, и в MessagePack
+    route_class=MsgPackRoute,
 )
 
 
-@router.get("/")
-async def get_specific_operations(operation_type: str, session: AsyncSession = Depends(get_async_session)):
-    query = select(Operation).where(Operation.type == operation_type)
-    result = await session.execute(query)
-    return result.all()
+@router.get("/", response_model=OperationPage)
+async def get_specific_operations(
+    request: Request,
+    operation_type: str,
+    limit: int = Query(OPERATIONS_PAGE_SIZE, ge=1, le=OPERATIONS_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    if not OPERATIONS_CACHE_ENABLED:
+        page = await _fetch_operations_page(session, operation_type, limit, after, date_from, date_to)
+        return negotiated_response(request, page, headers={"Vary": "Accept"})
+
+    # JSON и MessagePack кэшируются отдельно, каждый со своим ETag
+    use_msgpack = wants_msgpack(request)
+    content_type = MSGPACK_MEDIA_TYPE if use_msgpack else "application/json"
+    generation = await response_cache.generation(operation_type)
+    key = cache_key(operation_type, generation, limit, after, date_from, date_to, content_type)
+    cached = await response_cache.get(key)
+    if cached is None:
+        page = await _fetch_operations_page(session, operation_type, limit, after, date_from, date_to)
+        cached = await response_cache.set(key, packb(page) if use_msgpack else dumps(page))
+
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"private, max-age={int(OPERATIONS_CACHE_TTL)}",
+        "Vary": "Accept",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type=content_type, headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or etag in tags
+
+
+async def _fetch_operations_page(session, operation_type, limit, after, date_from, date_to):
+    # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+    query, params = build_operations_query(operation_type, after, date_from, date_to, limit=limit + 1)
+    result = await session.execute(query, params)
+    keys = tuple(result.keys())
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date, last.id)
+    # Простые dict из уже готовых значений столбцов, без моделей и jsonable_encoder
+    return {"items": [dict(zip(keys, row)) for row in rows], "next_cursor": next_cursor}
+
+
+@router.get("/stream")
+async def stream_specific_operations(
+    request: Request,
+    operation_type: str,
+    after: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Потоковая выдача операций в формате NDJSON (или MessagePack) через серверный курсор
+    """
+    query, params = build_operations_query(operation_type, after, date_from, date_to)
+    session_maker = await choose_read_session_maker(request.cookies.get(LAST_WRITE_LSN_COOKIE))
+    # В MessagePack поток - это просто идущие подряд объекты, без разделителей
+    if wants_msgpack(request):
+        encode, media_type = packb, MSGPACK_MEDIA_TYPE
+    else:
+        encode, media_type = (lambda row: dumps(row) + b"\n"), "application/x-ndjson"
+
+    async def generate():
+        # Сессия открывается внутри генератора, чтобы жить столько же, сколько сам ответ
+        async with session_maker() as session:
+            result = await session.stream(query, params)
+            keys = tuple(result.keys())
+            async for chunk in result.partitions():
+                yield b"".join(encode(dict(zip(keys, row))) for row in chunk)
+
+    return StreamingResponse(generate(), media_type=media_type, headers={"Vary": "Accept"})
+
+
+@router.get("/feed/sse")
+async def operations_feed_sse(operation_type: Optional[str] = None, figi: Optional[str] = None):
+    """
+    Лента новых операций в формате Server-Sent Events вместо опроса GET /operations/
+    """
+    subscription = operation_feed.subscribe(operation_type, figi)
+
+    async def generate():
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(subscription.get(), OPERATIONS_FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if data is None:
+                    # Подписчик не успевал забирать события и был отключен
+                    yield b"event: overflow\ndata: {}\n\n"
+                    return
+                yield b"data: " + data + b"\n\n"
+        finally:
+            operation_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@router.post("/")
-async def add_specific_operations(new_operation: OperationCreate, session: AsyncSession = Depends(get_async_session)):
-    stmt = insert(Operation).values(**new_operation.dict())
-    await session.execute(stmt)
+@router.websocket("/feed/ws")
+async def operations_feed_ws(websocket: WebSocket, operation_type: Optional[str] = None, figi: Optional[str] = None):
+    """
+    Лента новых операций по WebSocket: каждое событие - отдельное текстовое сообщение с JSON
+    """
+    await websocket.accept()
+    subscription = operation_feed.subscribe(operation_type, figi)
+
+    async def watch_disconnect():
+        # Клиент ничего не присылает, но отключение нужно заметить сразу, а не при следующей отправке
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            operation_feed.unsubscribe(subscription)
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            data = await subscription.get()
+            if data is None:
+                break
+            await websocket.send_text(data.decode("utf-8"))
+        if not watcher.done():
+            # 1013: подписчик не успевал забирать события
+            await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        operation_feed.unsubscribe(subscription)
+
+
+def _cacheable(response: Response):
+    response.headers["Cache-Control"] = f"public, max-age={OPERATIONS_AGGREGATE_MAX_AGE}"
+
+
+@router.get("/aggregate/positions", response_model=List[PositionRow])
+async def get_positions(
+    response: Response,
+    figi: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(OPERATIONS_MAX_PAGE_SIZE, ge=1, le=OPERATIONS_MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """
+    Чистая позиция по каждому figi (покупки минус продажи)
+    """
+    query, params = build_positions_query(figi, date_from, date_to, limit)
+    result = await session.execute(query, params)
+    _cacheable(response)
+    return result.mappings().all()
+
+
+@router.get("/aggregate/volumes", response_model=List[VolumeRow])
+async def get_volumes(
+    response: Response,
+    group_by: List[AggregateGroup] = Query([]),
+    figi: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(OPERATIONS_MAX_PAGE_SIZE, ge=1, le=OPERATIONS_MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """
+    Количество операций и объем по типу, при необходимости еще и по figi / instrument_type
+    """
+    query, params = build_volumes_query(group_by, figi, date_from, date_to, limit)
+    result = await session.execute(query, params)
+    _cacheable(response)
+    return result.mappings().all()
+
+
+@router.get("/aggregate/buckets", response_model=List[BucketRow])
+async def get_buckets(
+    response: Response,
+    bucket: TimeBucket = TimeBucket.day,
+    group_by: List[AggregateGroup] = Query([]),
+    operation_type: Optional[str] = None,
+    figi: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(OPERATIONS_MAX_PAGE_SIZE, ge=1, le=OPERATIONS_MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """
+    Количество, объем и минимальное/максимальное quantity по интервалам времени
+    """
+    query, params = build_buckets_query(bucket, group_by, operation_type, figi, date_from, date_to, limit)
+    result = await session.execute(query, params)
+    _cacheable(response)
+    return result.mappings().all()
+
+
+@router.get("/export")
+async def export_operations(
+    request: Request,
+    format: ExportFormat = ExportFormat.csv,
+    operation_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Потоковая выгрузка операций в CSV, Arrow IPC или Parquet
+    """
+    if not format_available(format):
+        raise HTTPException(status_code=400, detail=f"Формат {format.value} недоступен: не установлен pyarrow")
+    sql, args = export_query(operation_type, date_from, date_to)
+    session_maker = await choose_read_session_maker(request.cookies.get(LAST_WRITE_LSN_COOKIE))
+
+    async def generate():
+        async with session_maker() as session:
+            async with driver_transaction(await session.connection()) as driver_connection:
+                if driver_connection is None:
+                    raise RuntimeError("Выгрузка поддерживается только для драйвера asyncpg")
+                chunks = iter_record_chunks(driver_connection, sql, args, OPERATIONS_EXPORT_CHUNK_SIZE)
+                async for data in ENCODERS[format](chunks):
+                    if data:
+                        yield data
+
+    filename = f"operations.{FILE_EXTENSIONS[format]}"
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/", dependencies=WRITE_DEPENDENCIES)
+async def add_specific_operations(
+    new_operation: OperationCreate,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+):
+    if operation_write_queue.running:
+        await operation_write_queue.submit(new_operation.dict())
+        if operation_write_queue.ack_mode == ACK_ON_ENQUEUE:
+            return {"status": "queued"}
+        await remember_write_lsn(session, response)
+        return {"status": "success"}
+
+    values = new_operation.dict()
+    values["id"] = (await session.execute(INSERT_OPERATION, values)).scalar_one()
+    if OPERATION_ROLLUPS:
+        await apply_rollups(session, [values])
+    feed = FeedBatch()
+    await feed.add(session, [values])
     await session.commit()
+    if OPERATIONS_CACHE_ENABLED:
+        await response_cache.invalidate([values["type"]])
+    feed.publish_committed()
+    await remember_write_lsn(session, response)
     return {"status": "success"}
+
+
+@router.post("/bulk", dependencies=WRITE_DEPENDENCIES)
+async def add_operations_bulk(
+    request: Request,
+    response: Response,
+    atomic: bool = False,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Массовая загрузка операций из JSON-массива или NDJSON-потока одной транзакцией.
+    Некорректные записи пропускаются и возвращаются в errors; при atomic=true
+    любая ошибка отменяет всю загрузку
+    """
+    inserted = 0
+    error_count = 0
+    errors = []
+    chunk = []
+    written_types = set()
+    feed = FeedBatch()
+
+    async with bulk_transaction(session) as driver_connection:
+        async for index, item in iter_bulk_payload(request):
+            values, item_errors = validate_operation(item)
+            if item_errors:
+                error_count += 1
+                if len(errors) < OPERATIONS_BULK_MAX_ERRORS:
+                    errors.append({"index": index, "errors": item_errors})
+                continue
+            if atomic and error_count:
+                # Дальнейшая запись бессмысленна, но разбор продолжаем ради полного отчета
+                continue
+            chunk.append(values)
+            written_types.add(values["type"])
+            if len(chunk) >= OPERATIONS_BULK_CHUNK_SIZE:
+                inserted += await write_operations(session, driver_connection, chunk, feed)
+                chunk = []
+
+        if atomic and error_count:
+            raise HTTPException(
+                status_code=422,
+                detail={"inserted": 0, "error_count": error_count, "errors": errors},
+            )
+        inserted += await write_operations(session, driver_connection, chunk, feed)
+
+    await session.commit()
+    if OPERATIONS_CACHE_ENABLED:
+        await response_cache.invalidate(written_types)
+    feed.publish_committed()
+    await remember_write_lsn(session, response)
+    return {"status": "success", "inserted": inserted, "error_count": error_count, "errors": errors}
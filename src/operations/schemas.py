@@ -1,12 +1,56 @@
 from datetime import datetime
-from typing import Optional
+from decimal import Decimal
+from typing import List, Optional
 
 from pydantic import BaseModel
 
 
 class OperationCreate(BaseModel):
-    quantity: str
+    quantity: Decimal
     figi: str
     instrument_type: Optional[str] = None
     date: datetime
     type: str
+
+
+class OperationRead(BaseModel):
+    # Столбцы operation допускают NULL (старые и загруженные в обход API строки)
+    id: int
+    quantity: Optional[Decimal] = None
+    figi: Optional[str] = None
+    instrument_type: Optional[str] = None
+    date: Optional[datetime] = None
+    type: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class OperationPage(BaseModel):
+    items: List[OperationRead]
+    next_cursor: Optional[str] = None
+
+
+class PositionRow(BaseModel):
+    figi: str
+    position: Decimal
+    operations: int
+
+
+class VolumeRow(BaseModel):
+    type: str
+    figi: Optional[str] = None
+    instrument_type: Optional[str] = None
+    operations: int
+    volume: Optional[Decimal] = None
+
+
+class BucketRow(BaseModel):
+    bucket: datetime
+    type: Optional[str] = None
+    figi: Optional[str] = None
+    instrument_type: Optional[str] = None
+    operations: int
+    volume: Optional[Decimal] = None
+    min_quantity: Optional[Decimal] = None
+    max_quantity: Optional[Decimal] = None
@@ -0,0 +1,275 @@
+"""
+Заполнение базы данных: начальные роли и пользователи из декларативного набора
+и, при необходимости, синтетические операции для нагрузочных тестов.
+Все пишется в одной транзакции через пул приложения: роли и пользователи -
+одним выражением INSERT ... ON CONFLICT (один запрос к базе), операции - пачками через COPY
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+from fastapi_users.password import PasswordHelper
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.auth.models import Role, User
+from src.auth.password import run_password_task
+from src.config import DEFAULT_ADMIN_PASSWORD, DEFAULT_USER_PASSWORD, OPERATION_PARTITIONING, OPERATION_ROLLUPS
+from src.database import engine
+from src.operations.bulk import COPY_COLUMNS, driver_transaction
+from src.operations.models import Operation
+from src.operations.partitions import is_partitioned, partition_statements
+from src.operations.rollups import refresh_rollups
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении набора начальных данных, входит в отпечаток схемы
+SEED_VERSION = "2"
+
+# Роли и пользователи за один запрос. Роли, которые уже есть, берутся из таблицы:
+# вставленные в этом же выражении строки основному запросу не видны, поэтому дублей нет
+SEED_SQL = """
+WITH seed_roles AS (
+    SELECT * FROM unnest(CAST(:role_names AS text[]), CAST(:role_permissions AS text[])) AS r(name, permissions)
+),
+seed_users AS (
+    SELECT * FROM unnest(
+        CAST(:emails AS text[]), CAST(:usernames AS text[]), CAST(:user_roles AS text[]),
+        CAST(:hashed_passwords AS text[]), CAST(:is_active AS boolean[]), CAST(:is_superuser AS boolean[]),
+        CAST(:is_verified AS boolean[])
+    ) AS u(email, username, role_name, hashed_password, is_active, is_superuser, is_verified)
+),
+inserted_roles AS (
+    INSERT INTO role (name, permissions)
+    SELECT name, CAST(permissions AS json) FROM seed_roles
+    ON CONFLICT (name) DO NOTHING
+    RETURNING id, name
+),
+roles AS (
+    SELECT id, name FROM inserted_roles
+    UNION ALL
+    SELECT role.id, role.name FROM role WHERE role.name IN (SELECT role_name FROM seed_users)
+),
+inserted_users AS (
+    INSERT INTO "user" (email, username, role_id, hashed_password, is_active, is_superuser, is_verified, registered_at)
+    SELECT seed_users.email, seed_users.username, roles.id, seed_users.hashed_password,
+           seed_users.is_active, seed_users.is_superuser, seed_users.is_verified, now()
+    FROM seed_users JOIN roles ON roles.name = seed_users.role_name
+    ON CONFLICT (email) DO NOTHING
+    RETURNING id
+)
+SELECT
+    (SELECT count(*) FROM inserted_roles) AS roles,
+    (SELECT count(*) FROM inserted_users) AS users,
+    ARRAY(
+        SELECT DISTINCT role_name FROM seed_users
+        WHERE role_name NOT IN (SELECT name FROM roles)
+        ORDER BY role_name
+    ) AS missing_roles
+"""
+
+password_helper = PasswordHelper()
+
+
+@dataclass
+class SyntheticOperations:
+    """
+    Параметры генерации синтетических операций
+    """
+    count: int
+    days: int = 365
+    instruments: int = 500
+    chunk_size: int = 50000
+    random_seed: Optional[int] = None
+
+
+@dataclass
+class SeedFixtures:
+    """
+    Набор данных для заполнения. Роли и пользователи, которые уже есть
+    в базе (по имени роли и email), не изменяются
+    """
+    roles: List[Dict[str, Any]] = field(default_factory=list)
+    users: List[Dict[str, Any]] = field(default_factory=list)
+    operations: Optional[SyntheticOperations] = None
+
+
+def default_fixtures(operations: Optional[SyntheticOperations] = None) -> SeedFixtures:
+    """
+    Базовые роли и пользователи проекта
+    """
+    return SeedFixtures(
+        roles=[
+            {"name": "admin", "permissions": {"admin": True, "read": True, "write": True, "delete": True}},
+            {"name": "user", "permissions": {"read": True, "write": True, "delete": False}},
+        ],
+        users=[
+            {
+                "email": "admin@example.com",
+                "username": "admin",
+                "role": "admin",
+                "password": DEFAULT_ADMIN_PASSWORD,
+                "is_superuser": True,
+            },
+            {
+                "email": "user@example.com",
+                "username": "user",
+                "role": "user",
+                "password": DEFAULT_USER_PASSWORD,
+                "is_superuser": False,
+            },
+        ],
+        operations=operations,
+    )
+
+
+async def seed(fixtures: Optional[SeedFixtures] = None, conn: Optional[AsyncConnection] = None) -> Dict[str, int]:
+    """
+    Записывает набор данных в одной транзакции. Если передано соединение,
+    используется его транзакция, иначе берется соединение из пула приложения.
+    Возвращает количество добавленных ролей, пользователей и операций
+    """
+    fixtures = fixtures or default_fixtures()
+    if conn is None:
+        async with engine.begin() as conn:
+            return await _seed(conn, fixtures)
+    return await _seed(conn, fixtures)
+
+
+async def _seed(conn: AsyncConnection, fixtures: SeedFixtures) -> Dict[str, int]:
+    stats = {"roles": 0, "users": 0, "operations": 0}
+
+    if fixtures.roles or fixtures.users:
+        result = (await conn.execute(text(SEED_SQL), await _seed_params(fixtures))).one()
+        if result.missing_roles:
+            raise ValueError(f"Не найдены роли для пользователей: {', '.join(result.missing_roles)}")
+        stats["roles"], stats["users"] = result.roles, result.users
+
+    if fixtures.operations is not None and fixtures.operations.count > 0:
+        stats["operations"] = await seed_synthetic_operations(conn, fixtures.operations)
+
+    return stats
+
+
+async def _seed_params(fixtures: SeedFixtures) -> Dict[str, Any]:
+    users = fixtures.users
+    # Хэши считаются параллельно в пуле потоков, тем же алгоритмом, что и при регистрации
+    hashes = await asyncio.gather(
+        *(run_password_task(password_helper.hash, user["password"]) for user in users)
+    )
+    return {
+        "role_names": [role["name"] for role in fixtures.roles],
+        "role_permissions": [json.dumps(role["permissions"]) for role in fixtures.roles],
+        "emails": [user["email"] for user in users],
+        "usernames": [user["username"] for user in users],
+        "user_roles": [user["role"] for user in users],
+        "hashed_passwords": list(hashes),
+        "is_active": [user.get("is_active", True) for user in users],
+        "is_superuser": [user.get("is_superuser", False) for user in users],
+        "is_verified": [user.get("is_verified", True) for user in users],
+    }
+
+
+# Распределение синтетических операций по типам и инструментам
+SYNTHETIC_TYPES = ("buy", "sell", "dividend", "commission")
+SYNTHETIC_TYPE_WEIGHTS = (45, 40, 5, 10)
+SYNTHETIC_INSTRUMENT_TYPES = ("share", "bond", "etf", "currency")
+SYNTHETIC_INSTRUMENT_TYPE_WEIGHTS = (60, 25, 10, 5)
+FIGI_ALPHABET = "0123456789BCDFGHJKLMNPQRSTVWXYZ"
+
+
+def synthetic_instruments(rng: random.Random, count: int) -> List[tuple]:
+    """
+    Инструменты в виде (figi, instrument_type) с FIGI похожими на настоящие
+    """
+    instrument_types = rng.choices(SYNTHETIC_INSTRUMENT_TYPES, SYNTHETIC_INSTRUMENT_TYPE_WEIGHTS, k=count)
+    return [
+        ("BBG" + "".join(rng.choices(FIGI_ALPHABET, k=9)), instrument_type)
+        for instrument_type in instrument_types
+    ]
+
+
+def synthetic_records(
+    rng: random.Random, instruments: List[tuple], cum_weights: List[float], start: datetime, seconds: int, count: int
+):
+    """
+    Пачка записей в порядке COPY_COLUMNS: (quantity, figi, instrument_type, date, type)
+    """
+    picked = rng.choices(instruments, cum_weights=cum_weights, k=count)
+    types = rng.choices(SYNTHETIC_TYPES, SYNTHETIC_TYPE_WEIGHTS, k=count)
+    randint = rng.randint
+    return [
+        (
+            Decimal(randint(1, 1000)),
+            figi,
+            instrument_type,
+            start + timedelta(seconds=randint(0, seconds)),
+            operation_type,
+        )
+        for (figi, instrument_type), operation_type in zip(picked, types)
+    ]
+
+
+async def seed_synthetic_operations(conn: AsyncConnection, options: SyntheticOperations) -> int:
+    """
+    Генерирует операции за последние options.days дней и пишет их пачками через COPY
+    """
+    rng = random.Random(options.random_seed)
+    instruments = synthetic_instruments(rng, options.instruments)
+    # Популярность инструментов убывает по закону Ципфа, как на реальном рынке
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(instruments))))
+    end = datetime.utcnow()
+    start = end - timedelta(days=options.days)
+    seconds = int((end - start).total_seconds())
+
+    if OPERATION_PARTITIONING and await is_partitioned(conn):
+        # Партиции на весь период, чтобы строки не попали в default
+        for statement in partition_statements(start, end):
+            await conn.execute(text(statement))
+
+    written = 0
+    started = time.perf_counter()
+    async with driver_transaction(conn) as driver_connection:
+        while written < options.count:
+            size = min(options.chunk_size, options.count - written)
+            records = synthetic_records(rng, instruments, cum_weights, start, seconds, size)
+            if driver_connection is not None:
+                await driver_connection.copy_records_to_table(
+                    Operation.__tablename__, records=records, columns=COPY_COLUMNS
+                )
+            else:
+                await conn.execute(insert(Operation), [dict(zip(COPY_COLUMNS, record)) for record in records])
+            written += size
+            elapsed = time.perf_counter() - started
+            logger.info(f"Записано операций: {written}/{options.count} ({written / elapsed:.0f} строк/с)")
+
+    if OPERATION_ROLLUPS:
+        # COPY идет в обход приращений, поэтому сводки за период пересчитываются целиком
+        await refresh_rollups(conn, start)
+    return written
+
+
+async def count_rows(conn: Optional[AsyncConnection] = None) -> Dict[str, int]:
+    """
+    Количество строк в заполняемых таблицах
+    """
+    query = select(
+        select(func.count()).select_from(Role).scalar_subquery(),
+        select(func.count()).select_from(User).scalar_subquery(),
+        select(func.count()).select_from(Operation).scalar_subquery(),
+    )
+    if conn is None:
+        async with engine.connect() as conn:
+            roles, users, operations = (await conn.execute(query)).one()
+    else:
+        roles, users, operations = (await conn.execute(query)).one()
+    return {"roles": roles, "users": users, "operations": operations}
@@ -0,0 +1,164 @@
+"""
+Быстрая сериализация ответов. JSON: если установлен orjson, он кодирует dict, list,
+str, числа и datetime на стороне C без обхода каждого поля в Python; иначе
+используется стандартный json с тем же форматом дат.
+MessagePack (если установлен msgpack) выбирается заголовками Accept и Content-Type
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется")
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default)
+else:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ через dumps. Содержимое должно состоять из простых типов,
+    поэтому в обработчике не нужны ни response_model, ни jsonable_encoder
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def packb(value: Any) -> bytes:
+    # Даты кодируются строками ISO 8601, как и в JSON
+    return msgpack.packb(value, default=_default, use_bin_type=True, datetime=False)
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return packb(content)
+
+
+def media_type(content_type: Optional[str]) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def accept_qualities(accept: str) -> Dict[str, float]:
+    """
+    Вес q каждого типа из заголовка Accept (без q - 1, некорректный q - 0)
+    """
+    qualities: Dict[str, float] = {}
+    for part in accept.split(","):
+        quality = 1.0
+        for param in part.split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        name = media_type(part)
+        qualities[name] = max(quality, qualities.get(name, 0.0))
+    return qualities
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    Клиент предпочитает MessagePack: его вес в Accept больше, чем у JSON.
+    При равных весах явно названный MessagePack выигрывает только у шаблонов (*/*)
+    """
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept")
+    if not accept:
+        return False
+    qualities = accept_qualities(accept)
+    msgpack_quality = max(qualities.get(name, 0.0) for name in MSGPACK_MEDIA_TYPES)
+    if msgpack_quality <= 0:
+        return False
+    if "application/json" in qualities:
+        return msgpack_quality > qualities["application/json"]
+    return msgpack_quality >= max(qualities.get("application/*", 0.0), qualities.get("*/*", 0.0))
+
+
+def is_msgpack_body(request: Request) -> bool:
+    # Заголовок берется из исходного scope: MsgPackRequest подменяет его для FastAPI
+    return media_type(Headers(scope=request.scope).get("content-type")) in MSGPACK_MEDIA_TYPES
+
+
+def negotiated_response(request: Request, content: Any, headers: Optional[dict] = None) -> Response:
+    """
+    Ответ в MessagePack или JSON в зависимости от Accept
+    """
+    if wants_msgpack(request):
+        return MsgPackResponse(content, headers=headers)
+    return FastJSONResponse(content, headers=headers)
+
+
+class MsgPackRequest(Request):
+    """
+    Запрос с телом в MessagePack. FastAPI разбирает тело как JSON только для
+    JSON Content-Type, поэтому для него тип подменяется, а json() распаковывает msgpack
+    """
+
+    @property
+    def headers(self) -> Headers:
+        if not hasattr(self, "_msgpack_headers"):
+            headers = MutableHeaders(scope=dict(self.scope, headers=list(self.scope["headers"])))
+            headers["content-type"] = "application/json"
+            self._msgpack_headers = Headers(raw=headers.raw)
+        return self._msgpack_headers
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            try:
+                self._json = msgpack.unpackb(await self.body(), raw=False)
+            except (ValueError, msgpack.UnpackException) as e:
+                raise HTTPException(status_code=400, detail=f"Некорректное тело MessagePack: {e}")
+        return self._json
+
+
+class MsgPackRoute(APIRoute):
+    """
+    Маршрут, принимающий тело запроса в MessagePack наравне с JSON
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def msgpack_route_handler(request: Request) -> Response:
+            if is_msgpack_body(request):
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="MessagePack недоступен: не установлен msgpack")
+                request = MsgPackRequest(request.scope, request.receive)
+            return await handler(request)
+
+        return msgpack_route_handler